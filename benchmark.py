@@ -0,0 +1,287 @@
+"""
+Headless benchmark of the demo scenes.
+
+    python benchmark.py                                 run the default grid
+    python benchmark.py --counts 1,8,32 --lengths 900,4000
+    python benchmark.py --output new.json --baseline baseline.json
+
+Each scenario runs in its own process so that peak RSS belongs to that
+scenario alone; base_rss_kb is the reading after imports, before the
+scene is built. Results are written as JSON; with --baseline, runs that
+are slower than the baseline by more than --tolerance are reported and the
+exit status is 1.
+"""
+import os
+import sys
+import json
+import time
+import random
+import resource
+import platform
+import subprocess
+
+os.environ.setdefault("HEADLESS", "1")
+
+import numpy as np
+
+import pymunk
+
+from engine import headless, landers, rovers, rocketry
+from engine.bake import bake_polyline
+from engine.body import Group, Body, Circle, Segment
+from engine.stepper import FixedStepper
+from engine.terrain import ChunkedTerrain
+
+
+# scenarios
+# each takes an entity count, a terrain length and a seed and returns a
+# FixedStepper plus the tick applying the scene's per-step game logic;
+# rockets fly in empty space, so the rocket scenario ignores the length
+
+def lander_scenario(count, length, seed):
+    space = pymunk.Space()
+    space.gravity = 0, -20
+
+    rng = random.Random(seed)
+    bake_polyline(space, landers.generate_terrain(rng, length), radius=1, tolerance=1.0,
+                  collision_type=landers.TERRAIN, elasticity=0.0, friction=1.0)
+    # low enough to touch down within the default run, so contacts are measured
+    bodies = [landers.create_lander(space, rng.uniform(0, length), rng.uniform(250, 350))[0]
+              for _ in range(count)]
+
+    landers.add_ground_handler(space, {body: landers.Hull() for body in bodies})
+
+    def tick(dt):
+        for body in bodies:
+            if body.velocity.y < -10:
+                body.apply_impulse_at_local_point((0, landers.thruster * dt), body.center_of_gravity)
+
+    return FixedStepper(space), tick
+
+
+def rover_scenario(count, length, seed):
+    space = pymunk.Space()
+    space.gravity = 0, -1000
+
+    terrain = ChunkedTerrain(space, seed=seed, ahead=length)
+    terrain.update(200)
+    motors, car = rovers.create_rover(space, 200, 600)
+    rovers.POGO.spawn_many(space, [(400 + 60 * (i % 10), 500 + 100 * (i // 10)) for i in range(count)])
+
+    def tick(dt):
+        for motor in motors:
+            motor.rate = -rovers.max_speed
+        terrain.update(car.position.x)
+
+    return FixedStepper(space, substeps=2), tick
+
+
+def box_scenario(count, length, seed):
+    space = pymunk.Space()
+    space.gravity = 0, -1000
+
+    rng = random.Random(seed)
+    circles = Group()
+    circles.add_all([Circle(rng.uniform(100, length - 100), rng.uniform(100, 500), 10)
+                     for _ in range(count)])
+    circles.set_attribute("elasticity", 0.98)
+    circles.set_attribute("friction", 1.0)
+    circles.add_to_space(space)
+
+    # circles fall up to about 17 px a step; with less than that between a
+    # circle's center and a wall's, the center crosses and is pushed out the far side
+    right = length - 50
+    segments = Group()
+    segments.add_all([
+        Segment(50, 50, (50, 50), (right, 50), 10, body_type=Body.STATIC),
+        Segment(50, 550, (50, 550), (50, 50), 10, body_type=Body.STATIC),
+        Segment(50, 550, (50, 550), (right, 550), 10, body_type=Body.STATIC),
+        Segment(right, 550, (right, 550), (right, 50), 10, body_type=Body.STATIC)
+    ])
+    segments.set_attribute("elasticity", 0.98)
+    segments.set_attribute("friction", 1.0)
+    segments.add_to_space(space)
+
+    stepper = FixedStepper(space)
+
+    def tick(dt):
+        # a second's worth of steps apart, so the check costs next to nothing;
+        # if the walls don't hold, the numbers measure free fall, not contacts
+        if stepper.steps % 60:
+            return
+        for circle in circles:
+            x, y = circle.body.position
+            if not (50 < x < right and 50 < y < 550):
+                raise AssertionError(f"circle escaped the box at {round(x)}, {round(y)}")
+
+    return stepper, tick
+
+
+def rocket_scenario(count, length, seed):
+    space = pymunk.Space()
+    space.gravity = 0, 0
+
+    rockets = []
+    for i in range(count):
+        pod = rocketry.Part()
+        pod.vertices = [(0, 0), (45, 90), (90, 0)]
+        pod.mass = 10
+        engine = rocketry.Engine()
+        engine.vertices = [(0, 0), (0, -engine.height), (engine.radial_size, -engine.height),
+                           (engine.radial_size, 0)]
+        engine.engage()
+
+        ship = rocketry.Rocket()
+        ship.add_part(pod)
+        ship.add_part(engine)
+        body, shapes, _ = ship.get_body_and_shapes((200 * i, 300))
+        space.add(body, *shapes)
+        rockets.append(ship)
+
+    def tick(dt):
+        for ship in rockets:
+            ship.fire(dt)
+
+    return FixedStepper(space), tick
+
+
+SCENARIOS = {
+    "lander": lander_scenario,
+    "rover": rover_scenario,
+    "box": box_scenario,
+    "rocket": rocket_scenario
+}
+
+
+# measurement
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(name, count, length, steps=600, warmup=60, seed=0):
+    """Step one scenario and return its timings."""
+    base_rss = peak_rss_kb()
+    build_start = time.perf_counter()
+    stepper, tick = SCENARIOS[name](count, length, seed)
+    build_time = time.perf_counter() - build_start
+
+    for _ in range(warmup):
+        stepper.advance(stepper.step, tick)
+
+    latencies = np.empty(steps)
+    start = time.perf_counter()
+    for i in range(steps):
+        step_start = time.perf_counter()
+        stepper.advance(stepper.step, tick)
+        latencies[i] = time.perf_counter() - step_start
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99)) * 1e6
+    space = stepper.space
+    return {
+        "scenario": name,
+        "count": count,
+        "length": length,
+        "steps": steps,
+        "bodies": len(space.bodies),
+        "shapes": len(space.shapes),
+        "constraints": len(space.constraints),
+        "build_ms": round(build_time * 1000, 3),
+        "steps_per_sec": round(steps / elapsed, 1),
+        "p50_us": round(p50, 2),
+        "p95_us": round(p95, 2),
+        "p99_us": round(p99, 2),
+        "max_us": round(latencies.max() * 1e6, 2),
+        "peak_rss_kb": peak_rss_kb(),
+        "base_rss_kb": base_rss
+    }
+
+
+def run_isolated(name, count, length, steps, seed):
+    command = [sys.executable, os.path.abspath(__file__), "--scenario", name,
+               "--count", str(count), "--length", str(length),
+               "--steps", str(steps), "--seed", str(seed)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    # pymunk prints a banner on import; the result is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# baseline comparison
+
+def key(result):
+    return result["scenario"], result["count"], result["length"]
+
+
+def compare(results, baseline, tolerance):
+    """Return a line per run that regressed against the baseline by more than tolerance."""
+    previous = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        throughput = result["steps_per_sec"] / old["steps_per_sec"]
+        latency = result["p95_us"] / old["p95_us"]
+        if throughput < 1 - tolerance or latency > 1 + tolerance:
+            name, count, length = key(result)
+            regressions.append(f"{name} count={count} length={length}: "
+                               f"{round(throughput * 100)}% throughput, {round(latency * 100)}% p95 latency")
+    return regressions
+
+
+def parse_list(value):
+    return [int(v) for v in value.split(",")]
+
+
+if __name__ == "__main__":
+    steps = headless.get_arg("steps", 600, int)
+    seed = headless.get_arg("seed", 0, int)
+
+    # child process: one scenario, one JSON line
+    scenario = headless.get_arg("scenario", None, str)
+    if scenario is not None:
+        count = headless.get_arg("count", 1, int)
+        length = headless.get_arg("length", 900, int)
+        print(json.dumps(measure(scenario, count, length, steps, seed=seed)))
+        sys.exit()
+
+    names = headless.get_arg("scenarios", ",".join(SCENARIOS), str).split(",")
+    counts = headless.get_arg("counts", [1, 4, 16, 64], parse_list)
+    lengths = headless.get_arg("lengths", [900, 3600], parse_list)
+    output_path = headless.get_arg("output", "benchmark.json", str)
+    baseline_path = headless.get_arg("baseline", None, str)
+    tolerance = headless.get_arg("tolerance", 0.15)
+
+    results = []
+    for name in names:
+        for length in lengths:
+            for count in counts:
+                result = run_isolated(name, count, length, steps, seed)
+                results.append(result)
+                print(f"{name:<8}count {count:<5}length {length:<6}"
+                      f"{result['steps_per_sec']:>10.0f} steps/sec  "
+                      f"p50 {result['p50_us']:>8.1f}  p95 {result['p95_us']:>8.1f}  "
+                      f"p99 {result['p99_us']:>8.1f} us  rss {result['peak_rss_kb'] // 1024} MB")
+
+    with open(output_path, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "pymunk": pymunk.version,
+            "platform": platform.platform(),
+            "steps": steps,
+            "seed": seed,
+            "results": results
+        }, f, indent=4)
+    print(f"wrote {len(results)} results to {output_path}")
+
+    if baseline_path is not None:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions against {baseline_path}:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"no regressions against {baseline_path}")
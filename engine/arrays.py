@@ -0,0 +1,131 @@
+import numpy as np
+
+import pymunk
+
+from engine.pose import set_pose
+
+
+class BodyArray(object):
+    """
+    Struct-of-arrays mirror of the bodies in an engine.body Group.
+
+    refresh() reads every body's position, velocity, angle and angular
+    velocity into contiguous arrays in one pass; call it once per step and
+    read the arrays instead of the per-body properties. Membership is
+    re-read when the group's version changes. Mass is only read then, too,
+    as it rarely changes; call rebuild() after changing it.
+
+    Writes go the other way: change the arrays in place and write() them
+    back, or use the vectorized helpers below.
+    """
+    def __init__(self, group):
+        self.group = group
+        self.version = None
+        self.rebuild()
+
+    def __len__(self):
+        return len(self.children)
+
+    def rebuild(self):
+        self.version = getattr(self.group, "version", None)
+        self.children = list(self.group)
+        self.bodies = [child.body for child in self.children]
+        self.shapes = [child.shapes for child in self.children]
+
+        count = len(self.bodies)
+        self.position = np.zeros((count, 2))
+        self.velocity = np.zeros((count, 2))
+        self.angle = np.zeros(count)
+        self.angular_velocity = np.zeros(count)
+        self.mass = np.array([b.mass for b in self.bodies], dtype=float)
+        self.dynamic = np.array([b.body_type == pymunk.Body.DYNAMIC for b in self.bodies], dtype=bool)
+        self.refresh()
+
+    def refresh(self):
+        """Read the state of every body. Returns self for chaining."""
+        if self.version is not None and self.group.version != self.version:
+            self.rebuild()
+            return self
+        if not self.bodies:
+            return self
+
+        rows = []
+        for b in self.bodies:
+            position = b.position
+            velocity = b.velocity
+            rows.append((position.x, position.y, velocity.x, velocity.y, b.angle, b.angular_velocity))
+        state = np.array(rows, dtype=float)
+        self.position[:] = state[:, 0:2]
+        self.velocity[:] = state[:, 2:4]
+        self.angle[:] = state[:, 4]
+        self.angular_velocity[:] = state[:, 5]
+        return self
+
+    def select(self, indices):
+        """Indices of the bodies to write to; None means all of them."""
+        if indices is None:
+            return range(len(self.bodies))
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        return indices.tolist()
+
+    def write(self, fields=("angle", "position", "velocity", "angular_velocity"), indices=None):
+        """Copy the given arrays back into the bodies."""
+        bodies = self.bodies
+        fields = list(fields)
+        if "angle" in fields and "position" in fields:
+            fields.remove("angle")
+            fields.remove("position")
+            angles = self.angle.tolist()
+            positions = self.position.tolist()
+            for i in self.select(indices):
+                set_pose(bodies[i], positions[i], angles[i])
+        for field in fields:
+            values = getattr(self, field).tolist()
+            for i in self.select(indices):
+                setattr(bodies[i], field, values[i])
+
+    def teleport(self, positions, indices=None):
+        """Move bodies to positions, one row per selected body."""
+        selected = self.select(indices)
+        self.position[selected] = positions
+        self.write(("position",), selected)
+
+    def set_velocity(self, velocities, indices=None):
+        selected = self.select(indices)
+        self.velocity[selected] = velocities
+        self.write(("velocity",), selected)
+
+    def apply_impulse(self, impulses, indices=None):
+        """
+        Apply world-space impulses, one row per selected body or a single row
+        for all of them, through each body's center of gravity. Only dynamic
+        bodies are affected. Velocities are re-read from the bodies first, so
+        changes since the last refresh() are kept, and a body selected more
+        than once gets every impulse.
+        """
+        selected = np.asarray(self.select(indices), dtype=int)
+        impulses = np.broadcast_to(np.asarray(impulses, dtype=float), (len(selected), 2))
+        dynamic = self.dynamic[selected]
+        selected = selected[dynamic]
+        bodies = self.bodies
+        targets = np.unique(selected).tolist()
+        for i in targets:
+            velocity = bodies[i].velocity
+            self.velocity[i] = velocity.x, velocity.y
+        np.add.at(self.velocity, selected, impulses[dynamic] / self.mass[selected, None])
+        self.write(("velocity",), targets)
+
+    def set_shape_attribute(self, attribute, values):
+        """Set e.g. friction or elasticity on every shape, from a scalar or one value per body."""
+        values = np.broadcast_to(np.asarray(values), (len(self.shapes),)).tolist()
+        for shapes, value in zip(self.shapes, values):
+            for shape in shapes:
+                setattr(shape, attribute, value)
+
+    def set_friction(self, values):
+        self.set_shape_attribute("friction", values)
+
+    def set_elasticity(self, values):
+        self.set_shape_attribute("elasticity", values)
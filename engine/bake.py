@@ -0,0 +1,110 @@
+import pymunk
+
+import numpy as np
+
+
+def segment_distances(points, a, b):
+    """Distance from each of points to the segment a-b."""
+    ab = b - a
+    length_sq = ab.dot(ab)
+    if length_sq == 0:
+        return np.hypot(*(points - a).T)
+    t = np.clip((points - a).dot(ab) / length_sq, 0, 1)
+    closest = a + np.outer(t, ab)
+    return np.hypot(*(points - closest).T)
+
+
+def merge_collinear(points, epsilon=1e-9):
+    """Drop interior vertices that lie on the line through their neighbours."""
+    if len(points) < 3:
+        return points
+    before = points[1:-1] - points[:-2]
+    after = points[2:] - points[1:-1]
+    cross = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+    # only drop vertices where the polyline keeps going the same way
+    forward = (before * after).sum(axis=1) > 0
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:-1] = ~((np.abs(cross) <= epsilon) & forward)
+    return points[keep]
+
+
+def simplify(points, tolerance):
+    """
+    Douglas-Peucker simplification. Returns the kept vertices and the largest
+    distance from a dropped vertex to the simplified polyline.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) < 3 or tolerance <= 0:
+        return points, 0.0
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    max_deviation = 0.0
+
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = segment_distances(points[first + 1:last], points[first], points[last])
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+        else:
+            max_deviation = max(max_deviation, float(distances[i]))
+
+    return points[keep], max_deviation
+
+
+class BakeResult(object):
+    def __init__(self, shapes, vertices, original_count, max_deviation):
+        self.shapes = shapes
+        self.vertices = vertices
+        self.original_count = original_count
+        self.max_deviation = max_deviation
+
+    @property
+    def shape_count(self):
+        return len(self.shapes)
+
+    @property
+    def reduction(self):
+        if self.original_count == 0:
+            return 0.0
+        return 1 - self.shape_count / self.original_count
+
+    def report(self):
+        return (f"baked {self.original_count} segments into {self.shape_count} "
+                f"({round(self.reduction * 100, 1)}% fewer), "
+                f"max deviation {round(self.max_deviation, 3)}")
+
+
+def bake_polyline(space, vertices, radius=1, tolerance=1.0, body=None, **attributes):
+    """
+    Merge and simplify a static polyline, then add the resulting segments to
+    the space in a single call. Extra keyword arguments (friction, elasticity,
+    collision_type, ...) are set on every shape.
+    """
+    if body is None:
+        body = space.static_body
+
+    points = np.asarray(vertices, dtype=float)
+    original_count = max(len(points) - 1, 0)
+
+    points = merge_collinear(points)
+    points, max_deviation = simplify(points, tolerance)
+
+    shapes = []
+    for a, b in zip(points[:-1].tolist(), points[1:].tolist()):
+        shape = pymunk.Segment(body, a, b, radius)
+        for attribute, value in attributes.items():
+            setattr(shape, attribute, value)
+        shapes.append(shape)
+
+    if shapes:
+        space.add(*shapes)
+
+    return BakeResult(shapes, points, original_count, max_deviation)
@@ -2,28 +2,91 @@ import pymunk # physics engine
 from pymunk.vec2d import Vec2d
 import pyglet # graphics engine
 
+from engine.decompose import centroid, convex_decomposition, mass_properties
+from engine.prefab import moment_for_box, moment_for_circle, moment_for_segment
+
+
+# callables notified with each Body as it is added to or removed from a space
+add_listeners = []
+remove_listeners = []
+
 
 # group
 class Group(object):
+    """
+    Ordered set of Bodies, indexed by class and by body type.
+
+    Membership is a dict lookup, so adding n bodies is O(n). The whole group
+    goes into or out of a space with a single space.add/space.remove call.
+    """
     def __init__(self):
-        self.children = []
-    
+        self.members = {} # dicts keep insertion order
+        self.by_class = {}
+        self.by_body_type = {}
+        self.version = 0 # bumped on every membership change
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __contains__(self, child):
+        return child in self.members
+
+    @property
+    def children(self):
+        return list(self.members)
+
     def add(self, child):
-        if not (child in self.children) and isinstance(child, Body):
-            self.children.append(child)
+        if child in self.members or not isinstance(child, Body):
+            return
+        self.members[child] = None
+        self.by_class.setdefault(type(child), {})[child] = None
+        self.by_body_type.setdefault(child.body_type, {})[child] = None
+        self.version += 1
 
     def add_all(self, children):
         for child in children:
             self.add(child)
 
+    def remove(self, child):
+        if child not in self.members:
+            return
+        del self.members[child]
+        del self.by_class[type(child)][child]
+        del self.by_body_type[child.body_type][child]
+        self.version += 1
+
+    def of_class(self, cls):
+        """Members that are instances of cls, e.g. group.of_class(Circle)."""
+        return [child for member_class, children in self.by_class.items()
+                if issubclass(member_class, cls) for child in children]
+
+    def of_body_type(self, body_type):
+        return list(self.by_body_type.get(body_type, ()))
+
     def set_attribute(self, attribute, value):
-        for child in self.children:
-            if hasattr(child, attribute):
-                setattr(child, attribute, value)
+        # look the attribute up once per class instead of once per child
+        for children in self.by_class.values():
+            if children and hasattr(next(iter(children)), attribute):
+                for child in children:
+                    setattr(child, attribute, value)
+
+    def space_objects(self):
+        return [item for child in self.members for item in child.add_properties]
 
     def add_to_space(self, space):
-        for child in self.children:
-            child.add_to_space(space)
+        space.add(*self.space_objects())
+        for child in self.members:
+            for listener in add_listeners:
+                listener(child)
+
+    def remove_from_space(self, space):
+        space.remove(*self.space_objects())
+        for child in self.members:
+            for listener in remove_listeners:
+                listener(child)
 
 
 # bodies
@@ -42,6 +105,13 @@ class Body(object):
 
     def add_to_space(self, space):
         space.add(*self.add_properties)
+        for listener in add_listeners:
+            listener(self)
+
+    def remove_from_space(self, space):
+        space.remove(*self.add_properties)
+        for listener in remove_listeners:
+            listener(self)
 
     @property
     def x(self):
@@ -76,13 +146,18 @@ class Body(object):
     def position(self, position):
         self.body.position = position
 
+    @property
+    def shapes(self):
+        return self.add_properties[1:]
+
     @property
     def friction(self):
         return self.shape.friction
 
     @friction.setter
     def friction(self, friction):
-        self.shape.friction = friction
+        for shape in self.shapes:
+            shape.friction = friction
 
     @property
     def elasticity(self):
@@ -90,7 +165,8 @@ class Body(object):
 
     @elasticity.setter
     def elasticity(self, elasticity):
-        self.shape.elasticity = elasticity
+        for shape in self.shapes:
+            shape.elasticity = elasticity
     
 
 class Circle(Body):
@@ -101,7 +177,7 @@ class Circle(Body):
 
         if moment == "default":
             # TODO: handle inner radius
-            moment = pymunk.moment_for_circle(self.mass, 0, self.radius)
+            moment = moment_for_circle(self.mass, 0, self.radius)
         else:
             moment = moment
             try:
@@ -116,23 +192,59 @@ class Circle(Body):
 
 
 class Polygon(Body):
+    """
+    Any simple outline, concave or not, made of convex pieces. anchor is the
+    point of the outline placed at x, y: "first" for its first vertex or
+    "centroid". shape is the first piece; shapes has them all.
+    """
     def __init__(self, x, y, vertices, anchor="first", mass=1, moment="default", body_type=Body.DYNAMIC):
         super().__init__(x, y, mass, body_type)
 
         self.vertices = vertices
 
+        if anchor == "first":
+            origin = vertices[0]
+        elif anchor == "centroid":
+            origin = centroid(vertices)
+        else:
+            raise ValueError(f"unknown anchor {anchor!r}")
+        outline = [(v[0] - origin[0], v[1] - origin[1]) for v in vertices]
+        self.pieces = convex_decomposition(outline)
+
+        center_of_gravity, default_moment, _ = mass_properties(self.pieces, self.mass)
+        if moment == "default":
+            moment = default_moment
+        else:
+            try:
+                float(moment)
+            except ValueError:
+                raise ValueError("explicitely defined moment must be castable to float")
+
+        self.moment = moment
+        if self.body_type == Body.DYNAMIC:
+            # chipmunk keeps the center of gravity in place, so put the origin back
+            self.body.center_of_gravity = center_of_gravity
+            self.body.position = x, y
+
+        shapes = [pymunk.Poly(self.body, piece) for piece in self.pieces]
+        self.shape = shapes[0]
+
+        self.add_properties = (self.body, *shapes)
+
 
 class Rectangle(Body):
     def __init__(self, x, y, width, height, mass=1, moment="default", body_type=Body.DYNAMIC):
         super().__init__(x, y, mass, body_type)
 
-        vertices = ((x, y), (x + width, y), (x, y + height), (x + width, y + height))
+        # body-local, with x, y at the bottom left corner
+        vertices = ((0, 0), (width, 0), (width, height), (0, height))
 
         self.__width = width
         self.__height = height
 
         if moment == "default":
-            moment = pymunk.moment_for_poly(self.mass, vertices)
+            # about the center, so every rectangle of a size shares one cache entry
+            moment = moment_for_box(self.mass, (width, height))
         else:
             moment = moment
             try:
@@ -141,6 +253,10 @@ class Rectangle(Body):
                 raise ValueError("explicitely defined moment must be castable to float")
 
         self.moment = moment
+        if self.body_type == Body.DYNAMIC:
+            # chipmunk keeps the center of gravity in place, so put the origin back
+            self.body.center_of_gravity = width / 2, height / 2
+            self.body.position = x, y
         self.shape = pymunk.Poly(self.body, vertices)
 
         self.add_properties = (self.body, self.shape)
@@ -163,7 +279,7 @@ class Segment(Body):
         diff = Vec2d(b) - Vec2d(a)
 
         if moment == "default":
-            moment = pymunk.moment_for_segment(self.mass, (0, 0), diff, self.thickness)
+            moment = moment_for_segment(self.mass, (0, 0), diff, self.thickness)
         else:
             moment = moment
             try:
@@ -0,0 +1,43 @@
+import pymunk
+
+
+class Camera(object):
+    """
+    Rectangular view of the world centered on a point, used to skip drawing
+    shapes that are off screen.
+    """
+    def __init__(self, width, height, margin=0):
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.center = (0, 0)
+
+        self.shape_filter = pymunk.ShapeFilter()
+
+        # counters from the last call to cull
+        self.drawn = 0
+        self.culled = 0
+
+    def look_at(self, position):
+        self.center = tuple(position)
+
+    @property
+    def bb(self):
+        x, y = self.center
+        half_width = self.width / 2 + self.margin
+        half_height = self.height / 2 + self.margin
+        return pymunk.BB(x - half_width, y - half_height, x + half_width, y + half_height)
+
+    def cull(self, space, total=None):
+        """
+        Return the shapes whose bounding boxes intersect the view, static
+        shapes first so that dynamic bodies draw on top of the terrain.
+        """
+        visible = space.bb_query(self.bb, self.shape_filter)
+        visible.sort(key=lambda shape: shape.body.body_type != pymunk.Body.STATIC)
+
+        if total is None:
+            total = len(space.shapes)
+        self.drawn = len(visible)
+        self.culled = total - self.drawn
+        return visible
@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import pymunk
+
+import numpy as np
+
+from engine import body as engine_body
+from engine.pose import set_pose
+
+
+MAGIC = b"CKPT"
+# 2: group children store a list of shape indices instead of a single "shape"
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+
+# magic, version, section count, then (offset, count) per section
+HEADER = struct.Struct("<4sHH")
+SECTION = struct.Struct("<QQ")
+ALIGNMENT = 8
+
+BODY_DTYPE = np.dtype([
+    ("type", "<i4"), ("mass", "<f8"), ("moment", "<f8"),
+    ("x", "<f8"), ("y", "<f8"), ("angle", "<f8"),
+    ("vx", "<f8"), ("vy", "<f8"), ("angular_velocity", "<f8"),
+    ("cog_x", "<f8"), ("cog_y", "<f8")
+])
+
+CIRCLE = 0
+POLY = 1
+SEGMENT = 2
+SHAPE_DTYPE = np.dtype([
+    ("kind", "<i4"), ("body", "<i4"),
+    ("friction", "<f8"), ("elasticity", "<f8"), ("radius", "<f8"),
+    ("collision_type", "<i8"), ("sensor", "<i4"),
+    ("first", "<i4"), ("count", "<i4")
+])
+
+# constraint kind: (class, parameter attributes, how many of them the constructor
+# takes); anchors take two slots in the parameter array
+CONSTRAINTS = [
+    (pymunk.PinJoint, ("anchor_a", "anchor_b", "distance"), 2),
+    (pymunk.SlideJoint, ("anchor_a", "anchor_b", "min", "max"), 4),
+    (pymunk.PivotJoint, ("anchor_a", "anchor_b"), 2),
+    (pymunk.DampedSpring, ("anchor_a", "anchor_b", "rest_length", "stiffness", "damping"), 5),
+    (pymunk.SimpleMotor, ("rate",), 1),
+    (pymunk.GearJoint, ("phase", "ratio"), 2),
+    (pymunk.RotaryLimitJoint, ("min", "max"), 2),
+]
+CONSTRAINT_DTYPE = np.dtype([
+    ("kind", "<i4"), ("a", "<i4"), ("b", "<i4"), ("collide_bodies", "<i4"),
+    ("max_force", "<f8"), ("error_bias", "<f8"), ("max_bias", "<f8"),
+    ("params", "<f8", (7,))
+])
+
+STATIC_BODY = -1
+
+writer = ThreadPoolExecutor(max_workers=1)
+
+
+class Scene(object):
+    """Everything restored from a checkpoint."""
+    def __init__(self, space):
+        self.space = space
+        self.bodies = []
+        self.shapes = []
+        self.constraints = []
+        self.named = {}
+        self.groups = {}
+        self.state = {}
+
+
+def shape_geometry(shape):
+    if isinstance(shape, pymunk.Circle):
+        return CIRCLE, [tuple(shape.offset)]
+    elif isinstance(shape, pymunk.Poly):
+        return POLY, [tuple(v) for v in shape.get_vertices()]
+    elif isinstance(shape, pymunk.Segment):
+        return SEGMENT, [tuple(shape.a), tuple(shape.b)]
+    raise TypeError(f"can't checkpoint shape {shape!r}")
+
+
+def flatten_params(constraint, attributes):
+    params = []
+    for attribute in attributes:
+        value = getattr(constraint, attribute)
+        if attribute.startswith("anchor"):
+            params += [value[0], value[1]]
+        else:
+            params.append(value)
+    return params + [0.0] * (7 - len(params))
+
+
+def capture(space, named=None, groups=None, state=None, include_static=True):
+    """
+    Pack a space into arrays plus a small JSON document. This is the only
+    part of saving that has to happen on the simulation thread. Without
+    include_static, static bodies and everything attached to them are left
+    out, e.g. for terrain that is regenerated from a seed.
+    """
+    bodies = [b for b in space.bodies if include_static or b.body_type != pymunk.Body.STATIC]
+    body_indices = {b: i for i, b in enumerate(bodies)}
+    if include_static:
+        body_indices[space.static_body] = STATIC_BODY
+
+    body_array = np.zeros(len(bodies), dtype=BODY_DTYPE)
+    for i, b in enumerate(bodies):
+        body_array[i] = (b.body_type, b.mass, b.moment,
+                         b.position[0], b.position[1], b.angle,
+                         b.velocity[0], b.velocity[1], b.angular_velocity,
+                         b.center_of_gravity[0], b.center_of_gravity[1])
+
+    shapes = [s for s in space.shapes if s.body in body_indices]
+    shape_indices = {s: i for i, s in enumerate(shapes)}
+    shape_array = np.zeros(len(shapes), dtype=SHAPE_DTYPE)
+    vertices = []
+    for i, s in enumerate(shapes):
+        kind, points = shape_geometry(s)
+        radius = getattr(s, "radius", 0.0)
+        shape_array[i] = (kind, body_indices[s.body], s.friction, s.elasticity, radius,
+                          s.collision_type, s.sensor, len(vertices), len(points))
+        vertices += points
+    vertex_array = np.array(vertices, dtype="<f8").reshape(-1, 2)
+
+    kinds = {cls: kind for kind, (cls, _, _) in enumerate(CONSTRAINTS)}
+    constraints = [c for c in space.constraints
+                   if type(c) in kinds and c.a in body_indices and c.b in body_indices]
+    constraint_indices = {c: i for i, c in enumerate(constraints)}
+    constraint_array = np.zeros(len(constraints), dtype=CONSTRAINT_DTYPE)
+    for i, c in enumerate(constraints):
+        kind = kinds[type(c)]
+        params = flatten_params(c, CONSTRAINTS[kind][1])
+        constraint_array[i] = (kind, body_indices[c.a], body_indices[c.b], c.collide_bodies,
+                               c.max_force, c.error_bias, c.max_bias, params)
+
+    meta = {
+        "space": {
+            "gravity": list(space.gravity),
+            "damping": space.damping,
+            "iterations": space.iterations
+        },
+        "named": {},
+        "groups": {},
+        "state": state or {}
+    }
+    for name, obj in (named or {}).items():
+        if obj in body_indices:
+            meta["named"][name] = ["body", body_indices[obj]]
+        elif obj in shape_indices:
+            meta["named"][name] = ["shape", shape_indices[obj]]
+        elif obj in constraint_indices:
+            meta["named"][name] = ["constraint", constraint_indices[obj]]
+    for name, group in (groups or {}).items():
+        children = []
+        for child in group.children:
+            if child.body not in body_indices:
+                # left out with the static bodies
+                continue
+            attributes = {k: v for k, v in vars(child).items()
+                          if k not in ("body", "shape", "add_properties")}
+            children.append({
+                "class": type(child).__name__,
+                "body": body_indices[child.body],
+                "shapes": [shape_indices[shape] for shape in child.shapes],
+                "attributes": attributes
+            })
+        meta["groups"][name] = children
+
+    meta_array = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+    return [body_array, shape_array, vertex_array, constraint_array, meta_array]
+
+
+def write(path, sections):
+    header_size = HEADER.size + SECTION.size * len(sections)
+    table = []
+    offset = header_size
+    for array in sections:
+        offset += -offset % ALIGNMENT
+        table.append((offset, len(array)))
+        offset += array.nbytes
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+        for entry in table:
+            f.write(SECTION.pack(*entry))
+        for (offset, _), array in zip(table, sections):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(array.tobytes())
+    # readers never see a half-written checkpoint
+    os.replace(temporary, path)
+    return path
+
+
+def save(path, space, named=None, groups=None, state=None, include_static=True, background=True):
+    """
+    Checkpoint a space. The arrays are captured immediately; the file is
+    written on a background thread unless background is False. Returns a
+    Future resolving to the path, or the path itself when written inline.
+
+    named maps names to bodies, shapes or constraints that should be easy
+    to find again after loading. groups maps names to engine.body Groups.
+    state is any JSON-serializable game state.
+    """
+    sections = capture(space, named, groups, state, include_static)
+    if background:
+        return writer.submit(write, path, sections)
+    return write(path, sections)
+
+
+def report(future):
+    """
+    Done-callback for a background save: says where the checkpoint went, or
+    why writing it failed, which would otherwise be lost with the Future.
+    """
+    error = future.exception()
+    if error is not None:
+        print(f"checkpoint not saved: {error!r}", file=sys.stderr)
+    else:
+        print(f"checkpoint saved to {future.result()}")
+
+
+def read_sections(path):
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, version, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint")
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"unsupported checkpoint version {version}")
+
+    dtypes = [BODY_DTYPE, SHAPE_DTYPE, np.dtype(("<f8", 2)), CONSTRAINT_DTYPE, np.dtype(np.uint8)]
+    sections = []
+    for i, dtype in enumerate(dtypes):
+        offset, length = SECTION.unpack_from(data, HEADER.size + SECTION.size * i)
+        sections.append(np.frombuffer(data, dtype=dtype, count=length, offset=offset))
+    return sections
+
+
+def load(path):
+    """Rebuild a scene from a checkpoint, reading the arrays straight from a memory map."""
+    body_array, shape_array, vertex_array, constraint_array, meta_array = read_sections(path)
+    meta = json.loads(meta_array.tobytes().decode("utf-8"))
+
+    space = pymunk.Space()
+    space.gravity = meta["space"]["gravity"]
+    space.damping = meta["space"]["damping"]
+    space.iterations = meta["space"]["iterations"]
+    scene = Scene(space)
+
+    for (body_type, mass, moment, x, y, angle, vx, vy, w, cog_x, cog_y) in body_array.tolist():
+        if body_type == pymunk.Body.DYNAMIC:
+            b = pymunk.Body(mass, moment)
+        else:
+            b = pymunk.Body(body_type=body_type)
+        b.center_of_gravity = cog_x, cog_y
+        set_pose(b, (x, y), angle)
+        if body_type != pymunk.Body.STATIC:
+            b.velocity = vx, vy
+            b.angular_velocity = w
+        scene.bodies.append(b)
+
+    def get_body(index):
+        return space.static_body if index == STATIC_BODY else scene.bodies[index]
+
+    vertices = vertex_array.tolist()
+    for (kind, body_index, friction, elasticity, radius,
+         collision_type, sensor, first, count) in shape_array.tolist():
+        b = get_body(body_index)
+        points = vertices[first:first + count]
+        if kind == CIRCLE:
+            shape = pymunk.Circle(b, radius, points[0])
+        elif kind == POLY:
+            shape = pymunk.Poly(b, points, radius=radius)
+        else:
+            shape = pymunk.Segment(b, points[0], points[1], radius)
+        shape.friction = friction
+        shape.elasticity = elasticity
+        shape.collision_type = collision_type
+        shape.sensor = bool(sensor)
+        scene.shapes.append(shape)
+
+    for (kind, a, b, collide_bodies, max_force, error_bias, max_bias,
+         params) in constraint_array.tolist():
+        cls, attributes, argument_count = CONSTRAINTS[kind]
+        values = []
+        for attribute in attributes:
+            if attribute.startswith("anchor"):
+                values.append(tuple(params[:2]))
+                params = params[2:]
+            else:
+                values.append(params[0])
+                params = params[1:]
+        constraint = cls(get_body(a), get_body(b), *values[:argument_count])
+        for attribute, value in zip(attributes[argument_count:], values[argument_count:]):
+            setattr(constraint, attribute, value)
+        constraint.collide_bodies = bool(collide_bodies)
+        constraint.max_force = max_force
+        constraint.error_bias = error_bias
+        constraint.max_bias = max_bias
+        scene.constraints.append(constraint)
+
+    space.add(*scene.bodies)
+    space.add(*scene.shapes)
+    space.add(*scene.constraints)
+
+    lookup = {"body": scene.bodies, "shape": scene.shapes, "constraint": scene.constraints}
+    for name, (kind, index) in meta["named"].items():
+        scene.named[name] = lookup[kind][index]
+
+    for name, children in meta["groups"].items():
+        group = engine_body.Group()
+        for child in children:
+            wrapper = getattr(engine_body, child["class"]).__new__(getattr(engine_body, child["class"]))
+            wrapper.__dict__.update(child["attributes"])
+            wrapper.body = get_body(child["body"])
+            indices = child["shapes"] if "shapes" in child else [child["shape"]]
+            shapes = [scene.shapes[i] for i in indices]
+            wrapper.shape = shapes[0]
+            wrapper.add_properties = (wrapper.body, *shapes)
+            group.add(wrapper)
+        scene.groups[name] = group
+
+    scene.state = meta["state"]
+    return scene
+
+
+def copy_body_state(source, target):
+    """Move target to source's pose and velocity, e.g. from a loaded scene into a live one."""
+    set_pose(target, source.position, source.angle)
+    target.velocity = source.velocity
+    target.angular_velocity = source.angular_velocity
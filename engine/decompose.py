@@ -0,0 +1,184 @@
+from functools import lru_cache
+
+import pymunk
+
+
+EPSILON = 1e-9
+
+
+def cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def signed_area(points):
+    return sum(points[i - 1][0] * p[1] - p[0] * points[i - 1][1] for i, p in enumerate(points)) / 2
+
+
+def centroid(points):
+    """Area centroid of a simple polygon."""
+    a = signed_area(points)
+    cx = cy = 0.0
+    for i, p in enumerate(points):
+        q = points[i - 1]
+        f = q[0] * p[1] - p[0] * q[1]
+        cx += (q[0] + p[0]) * f
+        cy += (q[1] + p[1]) * f
+    return cx / (6 * a), cy / (6 * a)
+
+
+def is_convex(points):
+    return all(cross(points[i - 2], points[i - 1], p) >= -EPSILON for i, p in enumerate(points))
+
+
+def clean(points):
+    """Drop repeated and collinear vertices."""
+    points = [p for i, p in enumerate(points) if p != points[i - 1]]
+    changed = True
+    while changed and len(points) > 3:
+        changed = False
+        for i in range(len(points)):
+            if abs(cross(points[i - 1], points[i], points[(i + 1) % len(points)])) <= EPSILON:
+                del points[i]
+                changed = True
+                break
+    return points
+
+
+def normalize(vertices):
+    """
+    Counter-clockwise float outline, rotated to start at its lowest vertex
+    and translated so that vertex is at the origin. Returns the outline and
+    the translation, so equal shapes share one cache entry wherever they are.
+    """
+    points = clean([(float(v[0]), float(v[1])) for v in vertices])
+    area = signed_area(points)
+    if len(points) < 3 or abs(area) <= EPSILON:
+        raise ValueError("a polygon needs at least 3 distinct, non-collinear vertices")
+    if area < 0:
+        points.reverse()
+    start = min(range(len(points)), key=points.__getitem__)
+    points = points[start:] + points[:start]
+    ox, oy = points[0]
+    return tuple((x - ox, y - oy) for x, y in points), (ox, oy)
+
+
+def on_segment(a, b, p):
+    return (min(a[0], b[0]) - EPSILON <= p[0] <= max(a[0], b[0]) + EPSILON and
+            min(a[1], b[1]) - EPSILON <= p[1] <= max(a[1], b[1]) + EPSILON)
+
+
+def segments_touch(a, b, c, d):
+    d1, d2 = cross(c, d, a), cross(c, d, b)
+    d3, d4 = cross(a, b, c), cross(a, b, d)
+    if (((d1 > EPSILON and d2 < -EPSILON) or (d1 < -EPSILON and d2 > EPSILON)) and
+            ((d3 > EPSILON and d4 < -EPSILON) or (d3 < -EPSILON and d4 > EPSILON))):
+        return True
+    return ((abs(d1) <= EPSILON and on_segment(c, d, a)) or (abs(d2) <= EPSILON and on_segment(c, d, b)) or
+            (abs(d3) <= EPSILON and on_segment(a, b, c)) or (abs(d4) <= EPSILON and on_segment(a, b, d)))
+
+
+def is_simple(points):
+    """No two non-adjacent edges touch."""
+    count = len(points)
+    for i in range(count):
+        for j in range(i + 2, count):
+            if i == 0 and j == count - 1:
+                continue
+            if segments_touch(points[i - 1], points[i], points[j - 1], points[j]):
+                return False
+    return True
+
+
+def in_triangle(p, a, b, c):
+    return cross(a, b, p) >= -EPSILON and cross(b, c, p) >= -EPSILON and cross(c, a, p) >= -EPSILON
+
+
+def triangulate(points):
+    """Ear clipping of a counter-clockwise simple polygon, as index triples."""
+    remaining = list(range(len(points)))
+    triangles = []
+    while len(remaining) > 3:
+        count = len(remaining)
+        for k in range(count):
+            i, j, l = remaining[k - 1], remaining[k], remaining[(k + 1) % count]
+            a, b, c = points[i], points[j], points[l]
+            if cross(a, b, c) <= EPSILON:
+                continue # reflex
+            if any(in_triangle(points[m], a, b, c) for m in remaining if m not in (i, j, l)):
+                continue
+            triangles.append([i, j, l])
+            del remaining[k]
+            break
+        else:
+            raise ValueError("polygon outline intersects itself")
+    triangles.append(remaining)
+    return triangles
+
+
+def merge(p, q):
+    """Join two counter-clockwise index polygons across a shared edge, or None."""
+    q_edges = {(q[i - 1], v): i for i, v in enumerate(q)}
+    for i, b in enumerate(p):
+        a = p[i - 1]
+        if (b, a) in q_edges:
+            k = q_edges[(b, a)]
+            # p from b around to a, then q's vertices strictly between a and b
+            p_part = p[i:] + p[:i]
+            q_part = q[k:] + q[:k]
+            return p_part + q_part[1:-1]
+    return None
+
+
+def merge_convex(points, pieces):
+    """Hertel-Mehlhorn: drop diagonals while the pieces either side stay convex."""
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(pieces)):
+            for j in range(i + 1, len(pieces)):
+                combined = merge(pieces[i], pieces[j])
+                if combined is not None and is_convex([points[v] for v in combined]):
+                    pieces[i] = combined
+                    del pieces[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return pieces
+
+
+@lru_cache(maxsize=256)
+def decompose_normalized(points):
+    if not is_simple(points):
+        raise ValueError("polygon outline intersects itself")
+    if is_convex(points):
+        return (points,)
+    pieces = merge_convex(points, triangulate(points))
+    return tuple(tuple(points[v] for v in piece) for piece in pieces)
+
+
+def convex_decomposition(vertices):
+    """
+    Split a simple, possibly concave outline into convex pieces. The result
+    is within a small factor of the fewest pieces possible. Decompositions
+    are cached by normalized outline.
+    """
+    points, (ox, oy) = normalize(vertices)
+    return [[(x + ox, y + oy) for x, y in piece] for piece in decompose_normalized(points)]
+
+
+def mass_properties(pieces, mass):
+    """
+    Center of gravity and moment about it for mass spread evenly over the
+    area of the pieces. Returns (center_of_gravity, moment, piece masses).
+    """
+    areas = [signed_area(piece) for piece in pieces]
+    total = sum(areas)
+    centroids = [centroid(piece) for piece in pieces]
+    cog = (sum(c[0] * a for c, a in zip(centroids, areas)) / total,
+           sum(c[1] * a for c, a in zip(centroids, areas)) / total)
+
+    masses = [mass * a / total for a in areas]
+    moment = sum(pymunk.moment_for_poly(m, piece, (-cog[0], -cog[1]))
+                 for m, piece in zip(masses, pieces))
+    return cog, moment, masses
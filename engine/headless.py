@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+
+# Headless mode is requested with --headless on the command line or by setting
+# the HEADLESS environment variable. Replays (--replay) always run headless.
+# This module must be imported before pyglet.window so that pyglet doesn't
+# try to open a shadow window.
+HEADLESS = "--headless" in sys.argv or "--replay" in sys.argv or bool(os.environ.get("HEADLESS"))
+
+if HEADLESS:
+    try:
+        import pyglet
+        pyglet.options["shadow_window"] = False
+    except ImportError:
+        pass
+
+
+def get_arg(name, default, type=float):
+    """Return the value following --name on the command line, converted with type."""
+    flag = "--" + name
+    if flag in sys.argv:
+        index = sys.argv.index(flag)
+        if index + 1 < len(sys.argv):
+            return type(sys.argv[index + 1])
+    return default
+
+
+# null renderer
+class NullWindow(object):
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def event(self, func):
+        return func
+
+    def push_handlers(self, *args, **kwargs):
+        pass
+
+    def clear(self):
+        pass
+
+
+class NullLabel(object):
+    def __init__(self, text="", x=0, y=0, **kwargs):
+        self.text = text
+        self.x = x
+        self.y = y
+
+    @property
+    def position(self):
+        return self.x, self.y
+
+    @position.setter
+    def position(self, position):
+        self.x, self.y = position
+
+    def draw(self):
+        pass
+
+
+# scripted input
+class ScriptedKeys(object):
+    """
+    Stand-in for pyglet's KeyStateHandler and pygame.key.get_pressed().
+
+    The script is a list of (start, end, symbols) tuples in simulated seconds.
+    A symbol is held while start <= t < end.
+    """
+    def __init__(self, script=()):
+        self.script = list(script)
+        self.pressed = set()
+
+    def __getitem__(self, symbol):
+        return symbol in self.pressed
+
+    def update(self, t):
+        self.pressed = set()
+        for start, end, symbols in self.script:
+            if start <= t < end:
+                self.pressed.update(symbols)
+
+
+def run(update, seconds, dt=1.0 / 60.0, keys=None):
+    """
+    Drive update(dt) in a tight loop for the given number of simulated seconds
+    and return a dict of timing statistics.
+    """
+    steps = int(round(seconds / dt))
+    t = 0.0
+    start = time.perf_counter()
+    for _ in range(steps):
+        if keys is not None:
+            keys.update(t)
+        update(dt)
+        t += dt
+    wall = time.perf_counter() - start
+
+    return {
+        "steps": steps,
+        "dt": dt,
+        "sim_time": t,
+        "wall_time": wall,
+        "steps_per_sec": steps / wall if wall > 0 else float("inf"),
+        "realtime_factor": t / wall if wall > 0 else float("inf"),
+    }
+
+
+def report(stats):
+    print(f"{stats['steps']} steps, {round(stats['sim_time'], 1)} simulated seconds "
+          f"in {round(stats['wall_time'], 3)} real seconds")
+    print(f"{round(stats['steps_per_sec'])} steps/sec, {round(stats['realtime_factor'], 1)}x realtime")
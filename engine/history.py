@@ -0,0 +1,141 @@
+import zlib
+from collections import deque
+
+import numpy as np
+
+from engine.pose import set_pose
+
+
+# per body: x, y, angle, vx, vy, angular velocity
+FIELDS = 6
+
+
+def capture_bodies(bodies):
+    state = np.empty((len(bodies), FIELDS), dtype=float)
+    for i, b in enumerate(bodies):
+        position = b.position
+        velocity = b.velocity
+        state[i] = (position[0], position[1], b.angle,
+                    velocity[0], velocity[1], b.angular_velocity)
+    return state
+
+
+def restore_bodies(bodies, state):
+    for b, (x, y, angle, vx, vy, w) in zip(bodies, state.tolist()):
+        set_pose(b, (x, y), angle)
+        b.velocity = vx, vy
+        b.angular_velocity = w
+        b.force = 0, 0
+        b.torque = 0
+
+
+class SnapshotGroup(object):
+    """A full keyframe followed by snapshots delta-encoded against their predecessor."""
+    def __init__(self, tick, keyframe, extra):
+        self.ticks = [tick]
+        self.frames = [zlib.compress(keyframe.tobytes(), 1)]
+        self.extras = [extra]
+        self.nbytes = len(self.frames[0])
+
+
+class RewindBuffer(object):
+    """
+    Bounded history of body pose and velocity for rewinding a scene.
+
+    The tracked bodies are captured every `every` steps. Each capture is
+    stored as the XOR of its float64 bit pattern with the previous capture,
+    which is mostly zero bits for small motions and compresses well with
+    zlib while remaining lossless. Every keyframe_every captures a full
+    keyframe starts a new group. Whole groups are dropped from the oldest
+    end once more than max_bytes are held.
+
+    capture_extra() may return any extra game state to keep with each
+    snapshot; it is handed back to restore_extra(extra) on rewind.
+    """
+    def __init__(self, bodies, every=1, keyframe_every=60, max_bytes=1024 * 1024,
+                 capture_extra=None, restore_extra=None):
+        self.bodies = list(bodies)
+        self.every = every
+        self.keyframe_every = keyframe_every
+        self.max_bytes = max_bytes
+        self.capture_extra = capture_extra
+        self.restore_extra = restore_extra
+
+        self.groups = deque()
+        self.nbytes = 0
+        self.previous = None
+
+    def __len__(self):
+        return sum(len(group.ticks) for group in self.groups)
+
+    @property
+    def oldest_tick(self):
+        return self.groups[0].ticks[0] if self.groups else None
+
+    @property
+    def newest_tick(self):
+        return self.groups[-1].ticks[-1] if self.groups else None
+
+    def record(self, tick):
+        """
+        Capture the bodies if tick falls on the capture interval. Ticks that
+        are already held, such as the one just rewound to, are skipped.
+        """
+        if tick % self.every or (self.groups and tick <= self.newest_tick):
+            return
+        state = capture_bodies(self.bodies)
+        extra = self.capture_extra() if self.capture_extra is not None else None
+
+        if not self.groups or len(self.groups[-1].ticks) >= self.keyframe_every:
+            group = SnapshotGroup(tick, state, extra)
+            self.groups.append(group)
+            self.nbytes += group.nbytes
+        else:
+            group = self.groups[-1]
+            delta = state.view(np.uint64) ^ self.previous.view(np.uint64)
+            frame = zlib.compress(delta.tobytes(), 1)
+            group.ticks.append(tick)
+            group.frames.append(frame)
+            group.extras.append(extra)
+            group.nbytes += len(frame)
+            self.nbytes += len(frame)
+        self.previous = state
+
+        while self.nbytes > self.max_bytes and len(self.groups) > 1:
+            self.nbytes -= self.groups.popleft().nbytes
+
+    def decode(self, group, index):
+        state = np.frombuffer(zlib.decompress(group.frames[0]), dtype=np.uint64).copy()
+        for frame in group.frames[1:index + 1]:
+            state ^= np.frombuffer(zlib.decompress(frame), dtype=np.uint64)
+        return state.view(float).reshape(-1, FIELDS)
+
+    def rewind(self, tick):
+        """
+        Restore the newest snapshot at or before tick and discard everything
+        after it. Returns the tick that was restored, or None if the history
+        doesn't reach back that far.
+        """
+        while self.groups and self.groups[-1].ticks[0] > tick:
+            self.nbytes -= self.groups.pop().nbytes
+        if not self.groups:
+            self.previous = None
+            return None
+
+        group = self.groups[-1]
+        index = max(i for i, t in enumerate(group.ticks) if t <= tick)
+        state = self.decode(group, index)
+
+        # drop the future
+        for frame in group.frames[index + 1:]:
+            group.nbytes -= len(frame)
+            self.nbytes -= len(frame)
+        del group.ticks[index + 1:]
+        del group.frames[index + 1:]
+        del group.extras[index + 1:]
+        self.previous = state
+
+        restore_bodies(self.bodies, state)
+        if self.restore_extra is not None:
+            self.restore_extra(group.extras[index])
+        return group.ticks[index]
@@ -0,0 +1,84 @@
+import math
+
+import pymunk
+
+
+# collision types
+LANDER = 1
+TERRAIN = 2
+
+mass = 10000
+lander_vertices = [(0, 0), (15, 30), (30, 0)]
+steering = 3000000
+thruster = 1000000
+
+def centroid(vertices):
+    sumx = 0
+    sumy = 0
+    for v in vertices:
+        sumx += v[0]
+        sumy += v[1]
+    return (sumx / len(vertices), sumy / len(vertices))
+
+def create_lander(space, x, y):
+    body = pymunk.Body(mass)
+    shape = pymunk.Poly(body, lander_vertices)
+    shape.collision_type = LANDER
+    body.moment = pymunk.moment_for_poly(mass, lander_vertices)
+    body.center_of_gravity = centroid(lander_vertices)
+    body.position = x, y
+    body.elasticity = 0.0
+    body.friction = 0.8
+    space.add(body, shape)
+    return body, shape
+
+def generate_terrain(rng, width=900, base=20):
+    previous = (0, rng.randint(0, 500) // 10 + base)
+    vertices = [previous]
+    while previous[0] < width:
+        x = rng.randint(previous[0] + 10, previous[0] + 50)
+        y = 100 * math.sin(x) + 100 + base#random.randint(0, 500) // 5 + base
+        vertices.append((x, y))
+        previous = x, y
+    return vertices
+
+def impact_damage(arbiter):
+    """
+    Integrity lost to a hard landing: energy lost to the collision plus the
+    impulse needed to resolve it. Only collisions that change the lander's
+    velocity by more than 4 mps count; post_solve runs after the solver has
+    stopped the lander, so its velocity can't tell a crash from a landing.
+    """
+    impulse = arbiter.total_impulse.length
+    if impulse / arbiter.shapes[0].body.mass > 4.0:
+        return arbiter.total_ke * 0.0000005 + impulse * 0.000015
+    return 0.0
+
+
+class Hull(object):
+    """Integrity and ground contacts of one lander, kept up to date by the ground handler."""
+    def __init__(self, integrity=100):
+        self.integrity = integrity
+        self.ground_contacts = 0
+
+def add_ground_handler(space, hulls):
+    """
+    Count terrain contacts and apply landing damage for the landers in
+    hulls, a dict from lander body to Hull. Landers may be added later.
+    """
+    def begin(arbiter, space, data):
+        hulls[arbiter.shapes[0].body].ground_contacts += 1
+        return True
+
+    def post_solve(arbiter, space, data):
+        hulls[arbiter.shapes[0].body].integrity -= impact_damage(arbiter)
+
+    def separate(arbiter, space, data):
+        hull = hulls[arbiter.shapes[0].body]
+        hull.ground_contacts = max(hull.ground_contacts - 1, 0)
+
+    handler = space.add_collision_handler(LANDER, TERRAIN)
+    handler.begin = begin
+    handler.post_solve = post_solve
+    handler.separate = separate
+    return handler
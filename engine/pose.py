@@ -0,0 +1,8 @@
+def set_pose(body, position, angle):
+    """
+    Put a body at position and angle. Setting the angle turns a body about
+    its center of gravity, which moves its origin unless the center of
+    gravity is at the origin, so the angle has to go first.
+    """
+    body.angle = angle
+    body.position = position
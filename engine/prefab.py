@@ -0,0 +1,151 @@
+from functools import lru_cache
+
+import pymunk
+
+
+# memoized mass properties, keyed by mass and geometry; bounded, since
+# callers may pass geometry that rarely repeats
+
+@lru_cache(maxsize=256)
+def cached_moment_for_circle(mass, inner_radius, outer_radius, offset):
+    return pymunk.moment_for_circle(mass, inner_radius, outer_radius, offset)
+
+@lru_cache(maxsize=256)
+def cached_moment_for_box(mass, size):
+    return pymunk.moment_for_box(mass, size)
+
+@lru_cache(maxsize=256)
+def cached_moment_for_poly(mass, vertices, offset, radius):
+    return pymunk.moment_for_poly(mass, vertices, offset, radius)
+
+@lru_cache(maxsize=256)
+def cached_moment_for_segment(mass, a, b, radius):
+    return pymunk.moment_for_segment(mass, a, b, radius)
+
+
+def point(p):
+    return float(p[0]), float(p[1])
+
+
+def moment_for_circle(mass, inner_radius, outer_radius, offset=(0, 0)):
+    return cached_moment_for_circle(mass, inner_radius, outer_radius, point(offset))
+
+def moment_for_box(mass, size):
+    return cached_moment_for_box(mass, point(size))
+
+def moment_for_poly(mass, vertices, offset=(0, 0), radius=0):
+    return cached_moment_for_poly(mass, tuple(point(v) for v in vertices), point(offset), radius)
+
+def moment_for_segment(mass, a, b, radius):
+    return cached_moment_for_segment(mass, point(a), point(b), radius)
+
+
+class Part(object):
+    """One body and its shape within a prefab, positioned relative to the prefab origin."""
+    __slots__ = ("name", "mass", "moment", "make_shape", "offset", "attributes")
+
+    def __init__(self, name, mass, moment, make_shape, offset, attributes):
+        self.name = name
+        self.mass = mass
+        self.moment = moment
+        self.make_shape = make_shape
+        self.offset = point(offset)
+        self.attributes = attributes
+
+
+class Instance(object):
+    """The bodies, shapes and constraints of one spawned prefab, looked up by name."""
+    def __init__(self):
+        self.bodies = {}
+        self.shapes = {}
+        self.constraints = {}
+
+    def __getitem__(self, name):
+        if name in self.bodies:
+            return self.bodies[name]
+        return self.constraints[name]
+
+    def space_objects(self):
+        objects = []
+        for name, body in self.bodies.items():
+            objects += (body, self.shapes[name])
+        return objects + list(self.constraints.values())
+
+
+class Prefab(object):
+    """
+    Description of an assembly of bodies, shapes and constraints that can be
+    spawned any number of times. Mass properties are worked out once, when
+    the parts are described, through memoized helpers; spawn_many adds all
+    instances to the space with a single space.add call.
+
+        pogo = Prefab()
+        pogo.box("carriage", 100, (50, 30), friction=0.4)
+        pogo.spawn_many(space, [(400, 500), (400, 600)])
+
+    moment=None derives the moment from the geometry; anything else is used
+    as given. Shape keyword arguments, e.g. friction or color, are set on
+    every spawned shape.
+    """
+    def __init__(self):
+        self.parts = []
+        self.joints = []
+
+    def add_part(self, name, mass, moment, make_shape, offset, attributes):
+        self.parts.append(Part(name, mass, moment, make_shape, offset, attributes))
+
+    def circle(self, name, mass, radius, offset=(0, 0), inner_radius=0, moment=None, **attributes):
+        if moment is None:
+            moment = moment_for_circle(mass, inner_radius, radius)
+        self.add_part(name, mass, moment, lambda body: pymunk.Circle(body, radius), offset, attributes)
+
+    def box(self, name, mass, size, offset=(0, 0), moment=None, **attributes):
+        if moment is None:
+            moment = moment_for_box(mass, size)
+        self.add_part(name, mass, moment, lambda body: pymunk.Poly.create_box(body, size), offset, attributes)
+
+    def poly(self, name, mass, vertices, offset=(0, 0), moment=None, **attributes):
+        if moment is None:
+            moment = moment_for_poly(mass, vertices)
+        self.add_part(name, mass, moment, lambda body: pymunk.Poly(body, vertices), offset, attributes)
+
+    def joint(self, name, cls, a, b, *args, **attributes):
+        """Connect parts a and b with cls(body_a, body_b, *args); name may be None."""
+        if name is None:
+            name = f"joint{len(self.joints)}"
+        self.joints.append((name, cls, a, b, args, attributes))
+
+    def build(self, x, y):
+        instance = Instance()
+        for part in self.parts:
+            body = pymunk.Body(part.mass, part.moment)
+            body.position = x + part.offset[0], y + part.offset[1]
+            shape = part.make_shape(body)
+            for attribute, value in part.attributes.items():
+                setattr(shape, attribute, value)
+            instance.bodies[part.name] = body
+            instance.shapes[part.name] = shape
+
+        for name, cls, a, b, args, attributes in self.joints:
+            constraint = cls(instance.bodies[a], instance.bodies[b], *args)
+            for attribute, value in attributes.items():
+                setattr(constraint, attribute, value)
+            instance.constraints[name] = constraint
+        return instance
+
+    def spawn_many(self, space, origins, sprites=None):
+        """
+        Build an instance at each (x, y) origin and add them all to the space
+        at once. (body, shape) pairs are appended to sprites if given.
+        """
+        instances = [self.build(x, y) for x, y in origins]
+        objects = []
+        for instance in instances:
+            objects += instance.space_objects()
+            if sprites is not None:
+                sprites += [(body, instance.shapes[name]) for name, body in instance.bodies.items()]
+        space.add(*objects)
+        return instances
+
+    def spawn(self, space, x, y, sprites=None):
+        return self.spawn_many(space, [(x, y)], sprites)[0]
@@ -0,0 +1,98 @@
+import json
+import time
+
+import numpy as np
+
+
+class NullScope(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SCOPE = NullScope()
+
+
+class Phase(object):
+    """Ring buffer of the last capacity samples of one phase, in seconds."""
+    def __init__(self, capacity):
+        self.samples = np.zeros(capacity)
+        self.index = 0
+        self.count = 0
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.add(time.perf_counter() - self.started)
+        return False
+
+    def add(self, seconds):
+        self.samples[self.index] = seconds
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+
+    def recent(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+
+class Profiler(object):
+    """
+    Timings for the phases of a frame, e.g.
+
+        with profiler.scope("physics"):
+            stepper.advance(dt, tick)
+
+    Each phase keeps only its last capacity samples. stats() reports
+    p50/p95/p99/max per phase in milliseconds. A disabled profiler hands out
+    a shared no-op scope, so the instrumentation can stay in place.
+    """
+    def __init__(self, capacity=600, enabled=True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.phases = {}
+
+    def phase(self, name):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(self.capacity)
+        return phase
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return self.phase(name)
+
+    def add(self, name, seconds):
+        """Record an externally measured sample, e.g. the frame dt."""
+        if self.enabled:
+            self.phase(name).add(seconds)
+
+    def stats(self):
+        stats = {}
+        for name, phase in self.phases.items():
+            samples = phase.recent()
+            if not len(samples):
+                continue
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99)) * 1000
+            stats[name] = {
+                "samples": phase.count,
+                "p50": round(p50, 3),
+                "p95": round(p95, 3),
+                "p99": round(p99, 3),
+                "max": round(samples.max() * 1000, 3)
+            }
+        return stats
+
+    def lines(self):
+        lines = [f"{'phase':<10}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}  ms"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<10}{s['p50']:>8.2f}{s['p95']:>8.2f}{s['p99']:>8.2f}{s['max']:>8.2f}")
+        return lines
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.stats(), f, indent=4)
@@ -0,0 +1,192 @@
+import math
+
+import pymunk
+
+import pyglet
+from pyglet.gl import GL_TRIANGLES
+
+import numpy as np
+
+from engine import body as engine_body
+
+
+def circle_triangles(center, radius, segments=16):
+    cx, cy = center
+    points = []
+    for i in range(segments):
+        a0 = 2 * math.pi * i / segments
+        a1 = 2 * math.pi * (i + 1) / segments
+        points += [(cx, cy),
+                   (cx + radius * math.cos(a0), cy + radius * math.sin(a0)),
+                   (cx + radius * math.cos(a1), cy + radius * math.sin(a1))]
+    return points
+
+
+def poly_triangles(vertices):
+    # pymunk polygons are convex, so a fan from the first vertex covers them
+    vertices = [tuple(v) for v in vertices]
+    points = []
+    for i in range(1, len(vertices) - 1):
+        points += [vertices[0], vertices[i], vertices[i + 1]]
+    return points
+
+
+def segment_triangles(a, b, radius):
+    ax, ay = a
+    bx, by = b
+    length = math.hypot(bx - ax, by - ay) or 1
+    nx = -(by - ay) / length * max(radius, 0.5)
+    ny = (bx - ax) / length * max(radius, 0.5)
+    return [(ax + nx, ay + ny), (ax - nx, ay - ny), (bx - nx, by - ny),
+            (ax + nx, ay + ny), (bx - nx, by - ny), (bx + nx, by + ny)]
+
+
+def shape_triangles(shape):
+    """Triangles covering a shape, in its body's local coordinates."""
+    if isinstance(shape, pymunk.Circle):
+        return circle_triangles(shape.offset, shape.radius)
+    elif isinstance(shape, pymunk.Poly):
+        return poly_triangles(shape.get_vertices())
+    elif isinstance(shape, pymunk.Segment):
+        return segment_triangles(shape.a, shape.b, shape.radius)
+    return []
+
+
+class BatchRenderer(object):
+    """
+    Retained-mode replacement for space.debug_draw built on a pyglet Batch.
+
+    Every shape gets its own vertex list. Static shapes are uploaded once;
+    dynamic shapes keep their local triangles in one packed array and only
+    have their vertex positions rewritten each frame. GL objects are created
+    lazily on the first draw, so shapes can be added before a window exists.
+    """
+    STATIC_COLOR = (200, 200, 200)
+    DYNAMIC_COLOR = (80, 160, 255)
+
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        self.pending = {} # used as an ordered set
+        self.vertex_lists = {}
+
+        # packed local triangles of dynamic shapes
+        self.dynamic_shapes = {} # ordered set, like pending
+        self.dynamic_bodies = []
+        self.local = np.empty((0, 2))
+        self.owners = np.empty(0, dtype=int)
+        self.slices = []
+        self.__dirty = False
+
+        # optional pose(body) -> (x, y, angle) override, e.g. FixedStepper.pose
+        self.pose = None
+
+    def attach(self):
+        """Track every engine.body.Body as it is added to or removed from a space."""
+        engine_body.add_listeners.append(self.add_body)
+        engine_body.remove_listeners.append(self.remove_body)
+
+    def detach(self):
+        if self.add_body in engine_body.add_listeners:
+            engine_body.add_listeners.remove(self.add_body)
+        if self.remove_body in engine_body.remove_listeners:
+            engine_body.remove_listeners.remove(self.remove_body)
+
+    def add_body(self, body):
+        for shape in body.shapes:
+            self.add(shape)
+
+    def remove_body(self, body):
+        for shape in body.shapes:
+            self.remove(shape)
+
+    def add_space(self, space):
+        for shape in space.shapes:
+            self.add(shape)
+
+    def add(self, shape):
+        if shape not in self.vertex_lists:
+            self.vertex_lists[shape] = None
+            self.pending[shape] = None
+
+    def remove(self, shape):
+        vertex_list = self.vertex_lists.pop(shape, None)
+        if vertex_list is not None:
+            vertex_list.delete()
+        self.pending.pop(shape, None)
+        if shape in self.dynamic_shapes:
+            del self.dynamic_shapes[shape]
+            self.__dirty = True
+
+    def upload_pending(self):
+        for shape in self.pending:
+            triangles = shape_triangles(shape)
+            if not triangles:
+                continue
+            count = len(triangles)
+            color = tuple(getattr(shape, "color", ())[:3]) or None
+
+            if shape.body.body_type == pymunk.Body.STATIC:
+                world = [shape.body.local_to_world(p) for p in triangles]
+                self.vertex_lists[shape] = self.batch.add(
+                    count, GL_TRIANGLES, None,
+                    ("v2f/static", [c for p in world for c in p]),
+                    ("c3B/static", (color or BatchRenderer.STATIC_COLOR) * count)
+                )
+            else:
+                self.vertex_lists[shape] = self.batch.add(
+                    count, GL_TRIANGLES, None,
+                    ("v2f/stream", [c for p in triangles for c in p]),
+                    ("c3B/static", (color or BatchRenderer.DYNAMIC_COLOR) * count)
+                )
+                self.dynamic_shapes[shape] = None
+                self.__dirty = True
+        self.pending = {}
+
+    def pack(self):
+        self.dynamic_bodies = []
+        body_indices = {}
+        local = []
+        owners = []
+        self.slices = []
+        for shape in self.dynamic_shapes:
+            body = shape.body
+            if body not in body_indices:
+                body_indices[body] = len(self.dynamic_bodies)
+                self.dynamic_bodies.append(body)
+            start = len(local)
+            local += [tuple(p) for p in shape_triangles(shape)]
+            owners += [body_indices[body]] * (len(local) - start)
+            self.slices.append((start, len(local)))
+
+        self.local = np.array(local, dtype=float).reshape(-1, 2)
+        self.owners = np.array(owners, dtype=int)
+        self.__dirty = False
+
+    def update(self):
+        """Rewrite the vertex positions of every dynamic shape in place."""
+        if self.pending:
+            self.upload_pending()
+        if self.__dirty:
+            self.pack()
+        if not self.dynamic_bodies:
+            return
+
+        if self.pose is None:
+            state = np.array([(b.position[0], b.position[1], b.angle) for b in self.dynamic_bodies])
+        else:
+            state = np.array([self.pose(b) for b in self.dynamic_bodies])
+        angles = state[self.owners, 2]
+        cos = np.cos(angles)
+        sin = np.sin(angles)
+        x = self.local[:, 0]
+        y = self.local[:, 1]
+        world = np.empty_like(self.local)
+        world[:, 0] = x * cos - y * sin + state[self.owners, 0]
+        world[:, 1] = x * sin + y * cos + state[self.owners, 1]
+
+        for shape, (start, end) in zip(self.dynamic_shapes, self.slices):
+            self.vertex_lists[shape].vertices[:] = world[start:end].ravel().tolist()
+
+    def draw(self):
+        self.update()
+        self.batch.draw()
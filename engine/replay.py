@@ -0,0 +1,103 @@
+import zlib
+import struct
+
+import numpy as np
+
+
+MAGIC = b"RPLY"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHQI")
+COUNT = struct.Struct("<I")
+
+
+class Recording(object):
+    """
+    Input log of a session: the random seed, the dt of every tick and, per
+    tick, a bitmask of which of the watched key symbols were held. The final
+    state of the session is stored alongside so a replay can be verified.
+
+    On disk: header (magic, version, seed, key count) followed by a zlib
+    stream holding the key symbols as uint32, the tick count, the dts as
+    float64, the masks as uint32, then the final state as a count followed
+    by float64 values. Steady frame rates make the dts compress very well.
+    """
+    def __init__(self, seed, symbols):
+        self.seed = seed
+        self.symbols = list(symbols)
+        if len(self.symbols) > 32:
+            raise ValueError("at most 32 key symbols can be recorded")
+
+        self.dts = []
+        self.masks = []
+        self.final = ()
+
+    def __len__(self):
+        return len(self.dts)
+
+    def record(self, dt, keys):
+        mask = 0
+        for i, symbol in enumerate(self.symbols):
+            if keys[symbol]:
+                mask |= 1 << i
+        self.dts.append(dt)
+        self.masks.append(mask)
+
+    def pressed(self, tick):
+        mask = self.masks[tick]
+        return {symbol for i, symbol in enumerate(self.symbols) if mask & (1 << i)}
+
+    def save(self, path):
+        body = b"".join((
+            np.asarray(self.symbols, dtype="<u4").tobytes(),
+            COUNT.pack(len(self.dts)),
+            np.asarray(self.dts, dtype="<f8").tobytes(),
+            np.asarray(self.masks, dtype="<u4").tobytes(),
+            COUNT.pack(len(self.final)),
+            np.asarray(self.final, dtype="<f8").tobytes()
+        ))
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, len(self.symbols)))
+            f.write(zlib.compress(body))
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, version, seed, key_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        if version != VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+        data = zlib.decompress(data[HEADER.size:])
+        offset = 0
+
+        symbols = np.frombuffer(data, dtype="<u4", count=key_count, offset=offset)
+        offset += symbols.nbytes
+        recording = Recording(seed, symbols.tolist())
+
+        tick_count, = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        dts = np.frombuffer(data, dtype="<f8", count=tick_count, offset=offset)
+        offset += dts.nbytes
+        masks = np.frombuffer(data, dtype="<u4", count=tick_count, offset=offset)
+        offset += masks.nbytes
+        recording.dts = dts.tolist()
+        recording.masks = masks.tolist()
+
+        final_count, = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        recording.final = tuple(np.frombuffer(data, dtype="<f8", count=final_count, offset=offset).tolist())
+
+        return recording
+
+
+def replay(recording, update, keys):
+    """
+    Feed a recording back through update(dt) as fast as possible. keys is a
+    headless.ScriptedKeys whose pressed set is driven from the log.
+    """
+    for tick, dt in enumerate(recording.dts):
+        keys.pressed = recording.pressed(tick)
+        update(dt)
@@ -0,0 +1,398 @@
+from functools import lru_cache
+
+import numpy as np
+
+import pymunk
+
+from engine.decompose import centroid, cross, signed_area
+
+
+def convex_hull(points):
+    """Andrew's monotone chain; counter-clockwise, without collinear points."""
+    points = sorted(set(points))
+    if len(points) < 3:
+        return points
+
+    def half(points):
+        hull = []
+        for p in points:
+            while len(hull) >= 2 and cross(hull[-2], hull[-1], p) <= 0:
+                hull.pop()
+            hull.append(p)
+        return hull[:-1]
+
+    return half(points) + half(reversed(points))
+
+
+def hull_properties(vertices):
+    """
+    Convex hull of a part's vertices, its area, centroid and moment per unit
+    mass about that centroid. The work is cached relative to the first
+    vertex, so identical parts share it wherever they are.
+    """
+    ox, oy = vertices[0]
+    hull, area, (cx, cy), unit_moment = local_hull_properties(tuple((x - ox, y - oy) for x, y in vertices))
+    return tuple((x + ox, y + oy) for x, y in hull), area, (cx + ox, cy + oy), unit_moment
+
+
+@lru_cache(maxsize=1024)
+def local_hull_properties(vertices):
+    hull = tuple(convex_hull(vertices))
+    area = signed_area(hull) if len(hull) >= 3 else 0.0
+    if area <= 1e-9:
+        # a point or a line: treat the mass as sitting at the vertex average
+        center = (sum(v[0] for v in vertices) / len(vertices), sum(v[1] for v in vertices) / len(vertices))
+        return hull, area, center, 0.0
+    center = centroid(hull)
+    unit_moment = pymunk.moment_for_poly(1, hull, (-center[0], -center[1]))
+    return hull, area, center, unit_moment
+
+
+class Part:
+    STACKED = 0
+    RADIAL = 1
+
+    def __init__(self):
+        self.vertices = [(0, 0)]
+
+        self.mount = Part.STACKED
+
+        self.mass = 0
+        self.radial_size = 0 # only applies to circular parts
+        self.height = 0
+
+        self.impact_tolerance = 0 # mps
+        self.heat_tolerance = 0
+
+    @property
+    def vertices(self):
+        return self.__vertices
+
+    @vertices.setter
+    def vertices(self, vertices):
+        self.__vertices = [tuple(v) for v in vertices]
+        self.__geometry = None
+
+    @property
+    def geometry(self):
+        if self.__geometry is None:
+            self.__geometry = hull_properties(self.__vertices)
+        return self.__geometry
+
+    @property
+    def hull(self):
+        return self.geometry[0]
+
+    @property
+    def centroid(self):
+        return self.geometry[2]
+
+    @property
+    def moment(self):
+        """Moment of inertia about the part's own centroid."""
+        return self.mass * self.geometry[3]
+
+    def move_to(self, x, y):
+        self.vertices = [(v[0] + x, v[1] + y) for v in self.vertices]
+
+
+class Engine(Part):
+    def __init__(self):
+        super().__init__()
+        self.cluster = None
+
+        self.radial_size = 90
+        self.height = 180
+
+        self.mass = 150
+        self.burn = 8.8
+        self.burning = False
+        self.throttle = 1.0
+        self.direction = (0, 1) # of thrust, in the vessel's frame
+        self.atm_thrust = 162.91
+        self.vac_thrust = 192.0
+
+    @property
+    def mount_point(self):
+        """Where the engine's thrust acts, in the vessel's frame."""
+        bottom_left = self.vertices[0]
+        return (bottom_left[0] + self.radial_size // 2, bottom_left[1] - self.height // 2)
+
+    def engage(self):
+        self.burning = True
+        if self.cluster is not None:
+            self.cluster.refresh()
+
+    def shutdown(self):
+        self.burning = False
+        if self.cluster is not None:
+            self.cluster.refresh()
+
+
+PART_ATTRIBUTES = ("mount", "mass", "radial_size", "height", "impact_tolerance", "heat_tolerance")
+ENGINE_ATTRIBUTES = PART_ATTRIBUTES + ("burn", "burning", "throttle", "direction", "atm_thrust", "vac_thrust")
+
+
+def part_state(part):
+    """A part as JSON-serializable attributes, e.g. for a checkpoint's state."""
+    if isinstance(part, Engine) and part.cluster is not None:
+        # remaining burn lives in the cluster while the engine is in one
+        part.cluster.sync()
+    attributes = ENGINE_ATTRIBUTES if isinstance(part, Engine) else PART_ATTRIBUTES
+    state = {"class": type(part).__name__, "vertices": [list(v) for v in part.vertices]}
+    state.update((name, getattr(part, name)) for name in attributes)
+    return state
+
+
+def load_part(state):
+    """Rebuild a part from part_state()."""
+    part = {"Part": Part, "Engine": Engine}[state["class"]]()
+    part.vertices = state["vertices"]
+    for name, value in state.items():
+        if name not in ("class", "vertices"):
+            setattr(part, name, tuple(value) if isinstance(value, list) else value)
+    return part
+
+
+class EngineCluster:
+    """
+    The engines of one vessel as NumPy arrays: mount point, thrust direction,
+    atmospheric and vacuum thrust, remaining burn, throttle and whether they
+    are burning. step() works out the net impulse and torque of the whole
+    cluster in one vectorized pass, applies them to the body with a single
+    impulse, and burns propellant once per step.
+
+    Remaining burn lives in the arrays while an engine is in the cluster;
+    sync() writes it back to the engines. After changing an engine's other
+    attributes directly, call refresh(); engage() and shutdown() do.
+    pressure blends vacuum (0) and sea level (1) thrust.
+    """
+    def __init__(self, pressure=1.0):
+        self.engines = {} # used as an ordered set
+        self.pressure = pressure
+        self.rows = []
+        self.dirty = True
+
+    def __len__(self):
+        return len(self.engines)
+
+    def add(self, engine):
+        self.refresh()
+        self.engines[engine] = None
+        engine.cluster = self
+
+    def remove(self, engine):
+        if engine not in self.engines:
+            return
+        self.refresh()
+        del self.engines[engine]
+        engine.cluster = None
+
+    def sync(self):
+        if not self.dirty:
+            for engine, burn in zip(self.rows, self.burn.tolist()):
+                engine.burn = burn
+
+    def refresh(self):
+        self.sync()
+        self.dirty = True
+
+    def rebuild(self):
+        rows = self.rows = list(self.engines)
+        self.mount = np.array([e.mount_point for e in rows], dtype=float).reshape(-1, 2)
+        direction = np.array([e.direction for e in rows], dtype=float).reshape(-1, 2)
+        self.direction = direction / np.hypot(direction[:, 0], direction[:, 1])[:, None]
+        self.atm_thrust = np.array([e.atm_thrust for e in rows], dtype=float)
+        self.vac_thrust = np.array([e.vac_thrust for e in rows], dtype=float)
+        self.burn = np.array([e.burn for e in rows], dtype=float)
+        self.throttle = np.array([e.throttle for e in rows], dtype=float)
+        self.burning = np.array([e.burning for e in rows], dtype=bool)
+        self.dirty = False
+
+    def set_throttle(self, values):
+        """Throttle every engine, from a scalar or one value per engine."""
+        if self.dirty:
+            self.rebuild()
+        self.throttle[:] = values
+        for engine, throttle in zip(self.rows, self.throttle.tolist()):
+            engine.throttle = throttle
+
+    def thrust(self):
+        """Current thrust of each engine; zero once it is out of propellant."""
+        if self.dirty:
+            self.rebuild()
+        thrust = self.vac_thrust + (self.atm_thrust - self.vac_thrust) * self.pressure
+        return np.where(self.burning & (self.burn > 0), thrust * self.throttle, 0.0)
+
+    def thrust_point(self):
+        """Thrust-weighted mean mount point, or None when nothing is firing."""
+        thrust = self.thrust()
+        total = thrust.sum()
+        if total <= 0:
+            return None
+        return tuple((self.mount * thrust[:, None]).sum(axis=0) / total)
+
+    def step(self, body, dt):
+        thrust = self.thrust()
+        firing = thrust > 0
+        if not firing.any():
+            return
+        self.burn -= np.where(firing, dt, 0.0)
+        np.maximum(self.burn, 0.0, out=self.burn)
+
+        impulses = self.direction * thrust[:, None]
+        cog = body.center_of_gravity
+        arms = self.mount - (cog.x, cog.y)
+        torque = (arms[:, 0] * impulses[:, 1] - arms[:, 1] * impulses[:, 0]).sum()
+        impulse_x, impulse_y = impulses.sum(axis=0).tolist()
+
+        body.apply_impulse_at_local_point((impulse_x, impulse_y), cog)
+        body.angular_velocity += float(torque) / body.moment
+
+
+class Rocket:
+    """
+    A vessel made of parts, simulated as one rigid body with a shape per
+    part. Mass, center of mass and moment are kept as running sums (mass,
+    first moment, and second moment about the origin via the parallel axis
+    theorem), so adding or removing a part is O(1) and the body is updated
+    in place. A part's contribution is captured when it is added; remove and
+    re-add a part after moving it or changing its mass. Engines are also kept
+    in an EngineCluster, which fire() steps.
+    """
+    def __init__(self):
+        self.parts = {} # part: (shape, mass, centroid, second moment about the origin)
+        self.body = None
+        self.engines = EngineCluster()
+
+        self.mass = 0.0
+        self.first_moment = (0.0, 0.0)
+        self.second_moment = 0.0
+
+    @property
+    def center_of_mass(self):
+        return (self.first_moment[0] / self.mass, self.first_moment[1] / self.mass)
+
+    @property
+    def moment(self):
+        cx, cy = self.center_of_mass
+        return self.second_moment - self.mass * (cx * cx + cy * cy)
+
+    def accumulate(self, mass, centroid, second, sign=1):
+        self.mass += sign * mass
+        self.first_moment = (self.first_moment[0] + sign * mass * centroid[0],
+                             self.first_moment[1] + sign * mass * centroid[1])
+        self.second_moment += sign * second
+
+    def add_part(self, part):
+        if part in self.parts:
+            return
+        mass = part.mass
+        cx, cy = part.centroid
+        second = part.moment + mass * (cx * cx + cy * cy)
+        self.accumulate(mass, (cx, cy), second)
+
+        shape = self.attach(part) if self.body is not None else None
+        self.parts[part] = (shape, mass, (cx, cy), second)
+        if isinstance(part, Engine):
+            self.engines.add(part)
+        self.update_body()
+
+    def remove_part(self, part):
+        if part not in self.parts:
+            return
+        shape, mass, centroid, second = self.parts.pop(part)
+        self.accumulate(mass, centroid, second, -1)
+        self.engines.remove(part)
+
+        if shape is not None and shape.space is not None:
+            shape.space.remove(shape)
+        self.update_body()
+
+    def stage(self, parts):
+        """
+        Separate parts into a new Rocket mid-flight and return it. Both halves
+        carry on moving as the rigid body did, which conserves linear and
+        angular momentum. Part contributions and shapes are moved across, so
+        only the staged shapes and the new body are swapped in the space.
+        """
+        parts = [part for part in parts if part in self.parts]
+        if self.body is None:
+            raise ValueError("the rocket has no body yet")
+        if not parts or len(parts) == len(self.parts):
+            raise ValueError("staging must leave parts on both sides")
+
+        body = self.body
+        space = body.space
+        velocity = body.velocity
+        angular_velocity = body.angular_velocity
+        center = body.local_to_world(body.center_of_gravity)
+
+        staged = Rocket()
+        # the staged parts keep their local vertices, so share the frame
+        staged.body = pymunk.Body(1, 1)
+        staged.body.position = body.position
+        staged.body.angle = body.angle
+
+        shapes = []
+        for part in parts:
+            shape, mass, centroid, second = entry = self.parts.pop(part)
+            self.accumulate(mass, centroid, second, -1)
+            staged.accumulate(mass, centroid, second)
+            staged.parts[part] = entry
+            shapes.append(shape)
+            if isinstance(part, Engine):
+                self.engines.remove(part)
+                staged.engines.add(part)
+
+        if space is not None:
+            space.remove(*shapes)
+        for shape in shapes:
+            shape.body = staged.body
+        self.update_body()
+        staged.update_body()
+        if space is not None:
+            space.add(staged.body, *shapes)
+
+        # each half moves like its center of mass did on the rigid body
+        for half in (self, staged):
+            offset = half.body.local_to_world(half.body.center_of_gravity) - center
+            half.body.velocity = (velocity[0] - angular_velocity * offset[1],
+                                  velocity[1] + angular_velocity * offset[0])
+            half.body.angular_velocity = angular_velocity
+        return staged
+
+    def fire(self, dt):
+        """Apply one step of thrust from every burning engine."""
+        if self.body is not None and len(self.engines):
+            self.engines.step(self.body, dt)
+
+    def attach(self, part):
+        shape = pymunk.Poly(self.body, part.hull)
+        if self.body.space is not None:
+            self.body.space.add(shape)
+        return shape
+
+    @property
+    def shapes(self):
+        return [shape for shape, _, _, _ in self.parts.values()]
+
+    def update_body(self):
+        if self.body is None or self.mass <= 0:
+            return
+        # setting the center of gravity moves the origin, so keep it in place
+        position = self.body.position
+        self.body.mass = self.mass
+        self.body.moment = self.moment
+        self.body.center_of_gravity = self.center_of_mass
+        self.body.position = position
+
+    def get_body_and_shapes(self, position=(450, 300)):
+        """Create the body on first use. Returns the body, its shapes and the world center of mass."""
+        if self.body is None:
+            self.body = pymunk.Body(self.mass, self.moment)
+            self.body.position = position
+            for part, (_, mass, centroid, second) in self.parts.items():
+                self.parts[part] = (self.attach(part), mass, centroid, second)
+            self.update_body()
+        return self.body, self.shapes, self.body.local_to_world(self.center_of_mass)
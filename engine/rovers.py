@@ -0,0 +1,49 @@
+import pymunk
+
+from engine.prefab import Prefab
+
+
+# prefabs
+POGO = Prefab()
+POGO.box("carriage", 100, (50, 30), color=(255, 0, 0), friction=0.4)
+
+POGO1 = Prefab()
+POGO1.box("carriage", 100, (50, 30), (0, 100), color=(255, 0, 0))
+POGO1.box("left_leg", 20, (10, 100), (-25, 50), moment=0, color=(255, 0, 0))
+POGO1.box("right_leg", 20, (10, 100), (25, 50), moment=0, color=(255, 0, 0))
+POGO1.circle("left_wheel", 10, 10, (-25, -50), friction=1.0, color=(0, 0, 0))
+POGO1.circle("right_wheel", 10, 10, (25, -50), friction=1.0, color=(0, 0, 0))
+POGO1.box("stick", 20, (40, 150), (0, -50), moment=0, color=(0, 0, 255))
+POGO1.joint(None, pymunk.PinJoint, "carriage", "left_leg", (0, 0), (0, 100))
+POGO1.joint(None, pymunk.PinJoint, "carriage", "left_leg", (25, 0), (0, 100))
+POGO1.joint(None, pymunk.PinJoint, "carriage", "right_leg", (0, 0), (0, 100))
+POGO1.joint(None, pymunk.PinJoint, "carriage", "right_leg", (25, 0), (0, 100))
+POGO1.joint(None, pymunk.PinJoint, "left_leg", "left_wheel", (5, 0), (0, 0))
+POGO1.joint(None, pymunk.PinJoint, "right_leg", "right_wheel", (5, 0), (0, 0))
+
+wheel_color = 0, 0, 0
+ROVER = Prefab()
+ROVER.circle("wheel1", 10, 25, (-55, 0), inner_radius=20, friction=1.5, color=wheel_color)
+ROVER.circle("wheel2", 10, 25, (55, 0), inner_radius=20, friction=1.5, color=wheel_color)
+ROVER.circle("wheel3", 10, 25, (0, 90), inner_radius=20, friction=1.5, color=wheel_color)
+ROVER.box("chassis", 100, (50, 30), (0, 30))
+ROVER.poly("plow", 50, [(0, 0), (0, 50), (25, 0)], (95, -20))
+ROVER.joint(None, pymunk.PinJoint, "wheel1", "chassis", (0, 0), (-25, -15))
+ROVER.joint(None, pymunk.PinJoint, "wheel1", "chassis", (0, 0), (-25,  15))
+ROVER.joint(None, pymunk.PinJoint, "wheel2", "chassis", (0, 0), (25,  -15))
+ROVER.joint(None, pymunk.PinJoint, "wheel2", "chassis", (0, 0), (25,   15))
+ROVER.joint(None, pymunk.PinJoint, "wheel3", "chassis", (0, 0), (-25, 15))
+ROVER.joint(None, pymunk.PinJoint, "wheel3", "chassis", (0, 0), (25, 15))
+ROVER.joint(None, pymunk.PinJoint, "chassis", "plow", (25, 25), (0, 50))
+ROVER.joint(None, pymunk.PinJoint, "wheel2", "plow", (0, 0), (0, 0))
+ROVER.joint(None, pymunk.PinJoint, "wheel2", "plow", (0, 0), (0, 50))
+ROVER.joint("motor1", pymunk.SimpleMotor, "wheel1", "chassis", 0)
+ROVER.joint("motor2", pymunk.SimpleMotor, "wheel2", "chassis", 0)
+ROVER.joint("motor3", pymunk.SimpleMotor, "wheel3", "chassis", 0)
+
+max_speed = 20
+
+def create_rover(space, x, y, sprites=None):
+    rover = ROVER.spawn(space, x, y, sprites)
+    motors = [rover["motor1"], rover["motor2"], rover["motor3"]]
+    return motors, rover["chassis"]
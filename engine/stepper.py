@@ -0,0 +1,79 @@
+class FixedStepper(object):
+    """
+    Fixed-timestep driver for a pymunk space.
+
+    Frame time is fed into an accumulator and the space is advanced in
+    fixed increments of step seconds, each split into substeps calls to
+    space.step. At most max_steps fixed steps run per frame; any backlog
+    beyond that is dropped instead of being carried into the next frame.
+
+    After advance, alpha is how far the leftover time reaches into the next
+    step, and pose(body) blends each body's previous and current pose by it.
+
+    With a profiler, the space.step calls are timed as the "physics" phase.
+    """
+    def __init__(self, space, step=1.0 / 60.0, substeps=1, max_steps=5, profiler=None):
+        self.space = space
+        self.profiler = profiler
+        self.step = step
+        self.substeps = substeps
+        self.max_steps = max_steps
+
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.paused = False
+        self.steps = 0 # fixed steps taken in total
+
+        self.previous = {}
+
+    def advance(self, frame_dt, tick=None):
+        """
+        Consume frame_dt seconds. tick(step) is called before every fixed
+        step, when self.steps is the number of steps completed so far.
+        Returns the number of fixed steps taken.
+        """
+        self.accumulator += frame_dt
+
+        taken = 0
+        while self.accumulator >= self.step and taken < self.max_steps:
+            if tick is not None:
+                tick(self.step)
+            self.previous = {b: (b.position, b.angle) for b in self.space.bodies}
+            if not self.paused:
+                if self.profiler is not None:
+                    with self.profiler.scope("physics"):
+                        self.step_space()
+                else:
+                    self.step_space()
+            self.accumulator -= self.step
+            self.steps += 1
+            taken += 1
+
+        if taken == self.max_steps and self.accumulator >= self.step:
+            # spiral of death: drop the time we couldn't catch up on
+            self.accumulator %= self.step
+
+        self.alpha = self.accumulator / self.step
+        return taken
+
+    def snap(self):
+        """Stop blending from the previous poses, e.g. after bodies were teleported or rewound."""
+        self.previous = {}
+
+    def step_space(self):
+        substep = self.step / self.substeps
+        for _ in range(self.substeps):
+            self.space.step(substep)
+
+    def pose(self, body):
+        """Return (x, y, angle) of body blended between the last two steps."""
+        position = body.position
+        angle = body.angle
+        if body not in self.previous:
+            return position[0], position[1], angle
+
+        previous_position, previous_angle = self.previous[body]
+        alpha = self.alpha
+        return (previous_position[0] + (position[0] - previous_position[0]) * alpha,
+                previous_position[1] + (position[1] - previous_position[1]) * alpha,
+                previous_angle + (angle - previous_angle) * alpha)
@@ -0,0 +1,123 @@
+import json
+
+import numpy as np
+
+import pymunk
+
+
+FIELDS = (
+    "arbiters", "contacts",
+    "awake", "sleeping",
+    "constraints", "max_impulse",
+    "dynamic_shapes", "kinematic_shapes", "static_shapes"
+)
+
+
+class Telemetry(object):
+    """
+    Sampled solver statistics for a space, kept in a fixed-size history.
+
+    record(tick) is meant to be called once per fixed step, between steps,
+    and only samples every `every` ticks. A sample counts the arbiters and
+    contact points of the last step, awake and sleeping bodies, the number of
+    constraints and the largest impulse any of them applied, and the shapes
+    in the broadphase per body type. pymunk 5 has no space-wide arbiter
+    iterator, so arbiters are gathered from each non-static body and
+    deduplicated by shape pair.
+
+    A sample costs about as much as a small scene's step, so keep every
+    large enough to amortize it; the default is twice a second at 60 Hz.
+    """
+    def __init__(self, space, every=30, capacity=600):
+        self.space = space
+        self.every = every
+
+        self.samples = np.zeros((capacity, len(FIELDS)))
+        self.ticks = np.zeros(capacity, dtype=np.int64)
+        self.index = 0
+        self.count = 0
+
+        self.pairs = set()
+
+    def __len__(self):
+        return min(self.count, len(self.samples))
+
+    def collect_arbiter(self, arbiter):
+        a, b = arbiter.shapes
+        pair = (a, b) if id(a) < id(b) else (b, a)
+        if pair not in self.pairs:
+            self.pairs.add(pair)
+            self.contacts += len(arbiter.contact_point_set.points)
+
+    def sample(self):
+        space = self.space
+        self.pairs.clear()
+        self.contacts = 0
+
+        awake = sleeping = 0
+        for body in space.bodies:
+            if body.body_type == pymunk.Body.STATIC:
+                continue
+            if body.is_sleeping:
+                sleeping += 1
+            else:
+                awake += 1
+                body.each_arbiter(self.collect_arbiter)
+
+        constraints = space.constraints
+        max_impulse = max((c.impulse for c in constraints), default=0.0)
+
+        shape_counts = [0, 0, 0]
+        for shape in space.shapes:
+            shape_counts[shape.body.body_type] += 1
+
+        return (len(self.pairs), self.contacts, awake, sleeping, len(constraints), max_impulse,
+                shape_counts[pymunk.Body.DYNAMIC], shape_counts[pymunk.Body.KINEMATIC],
+                shape_counts[pymunk.Body.STATIC])
+
+    def record(self, tick):
+        if tick % self.every:
+            return
+        self.samples[self.index] = self.sample()
+        self.ticks[self.index] = tick
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+
+    def history(self):
+        """The held samples, oldest first, as (ticks, samples)."""
+        if self.count <= len(self.samples):
+            return self.ticks[:self.count], self.samples[:self.count]
+        order = np.roll(np.arange(len(self.samples)), -self.index)
+        return self.ticks[order], self.samples[order]
+
+    def latest(self):
+        if not self.count:
+            return None
+        return dict(zip(FIELDS, self.samples[self.index - 1].tolist()))
+
+    def summary(self):
+        """Mean and max of every field over the held history."""
+        _, samples = self.history()
+        if not len(samples):
+            return {}
+        means = samples.mean(axis=0)
+        maxes = samples.max(axis=0)
+        return {field: {"mean": round(float(mean), 3), "max": round(float(top), 3)}
+                for field, mean, top in zip(FIELDS, means, maxes)}
+
+    def lines(self):
+        lines = [f"{'telemetry':<17}{'mean':>10}{'max':>10}"]
+        for field, s in self.summary().items():
+            lines.append(f"{field:<17}{s['mean']:>10.2f}{s['max']:>10.2f}")
+        return lines
+
+    def dump(self, path):
+        ticks, samples = self.history()
+        with open(path, "w") as f:
+            json.dump({
+                "fields": FIELDS,
+                "every": self.every,
+                "summary": self.summary(),
+                "ticks": ticks.tolist(),
+                "samples": samples.tolist()
+            }, f)
@@ -0,0 +1,247 @@
+import bisect
+import random
+from collections import deque
+
+import numpy as np
+
+import pymunk
+
+from engine.bake import bake_polyline
+
+
+class TerrainIndex(object):
+    """
+    Heightfield index over a polyline whose vertices are sorted by x.
+
+    Queries for a single x use bisection, batched queries use
+    np.searchsorted, so both are O(log n) per position.
+    """
+    def __init__(self, vertices, flat_slope=0.1, min_zone_width=30):
+        points = np.asarray(vertices, dtype=float)
+        if len(points) < 2:
+            raise ValueError("terrain needs at least two vertices")
+        if np.any(np.diff(points[:, 0]) <= 0):
+            raise ValueError("terrain vertices must be strictly increasing in x")
+
+        self.xs = points[:, 0].copy()
+        self.ys = points[:, 1].copy()
+        self.__x_list = self.xs.tolist()
+
+        dx = np.diff(self.xs)
+        dy = np.diff(self.ys)
+        self.slopes = np.arctan2(dy, dx) # radians from horizontal, one per segment
+        self.gradients = dy / dx
+
+        self.landing_zones = self.find_landing_zones(flat_slope, min_zone_width)
+
+    def __len__(self):
+        return len(self.slopes)
+
+    @property
+    def left(self):
+        return self.xs[0]
+
+    @property
+    def right(self):
+        return self.xs[-1]
+
+    def segment_at(self, x):
+        """Index of the segment under x, clamped to the ends of the terrain."""
+        index = bisect.bisect_right(self.__x_list, x) - 1
+        return min(max(index, 0), len(self.slopes) - 1)
+
+    def height_at(self, x):
+        i = self.segment_at(x)
+        return self.ys[i] + (x - self.xs[i]) * self.gradients[i]
+
+    def slope_at(self, x):
+        return self.slopes[self.segment_at(x)]
+
+    def query(self, x):
+        """Return (height, slope, segment index) under x."""
+        i = self.segment_at(x)
+        height = self.ys[i] + (x - self.xs[i]) * self.gradients[i]
+        return height, self.slopes[i], i
+
+    def segments_at(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        indices = np.searchsorted(self.xs, xs, side="right") - 1
+        return np.clip(indices, 0, len(self.slopes) - 1)
+
+    def heights_at(self, xs):
+        """Vertical raycast for many x positions at once."""
+        xs = np.asarray(xs, dtype=float)
+        indices = self.segments_at(xs)
+        return self.ys[indices] + (xs - self.xs[indices]) * self.gradients[indices]
+
+    def altitudes(self, xs, ys):
+        return np.asarray(ys, dtype=float) - self.heights_at(xs)
+
+    def find_landing_zones(self, max_slope, min_width):
+        """
+        Return (x_start, x_end) spans made of consecutive segments whose slope
+        is within max_slope radians of flat and which are at least min_width wide.
+        """
+        flat = np.abs(self.slopes) <= max_slope
+        # pad with False so every run has a rising and a falling edge
+        edges = np.diff(np.concatenate(([False], flat, [False])).astype(int))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+
+        zones = []
+        for start, end in zip(starts, ends):
+            x_start, x_end = self.xs[start], self.xs[end]
+            if x_end - x_start >= min_width:
+                zones.append((float(x_start), float(x_end)))
+        return zones
+
+    def landing_zone_at(self, x):
+        for x_start, x_end in self.landing_zones:
+            if x_start <= x <= x_end:
+                return x_start, x_end
+        return None
+
+
+class TerrainChunk(object):
+    def __init__(self, index, vertices, shapes, baked):
+        self.index = index
+        self.vertices = vertices # as generated, used to find neighbouring chunks
+        self.shapes = shapes
+        self.baked = baked # simplified vertices that the shapes were made from
+
+    @property
+    def start(self):
+        return tuple(self.vertices[0])
+
+    @property
+    def end(self):
+        return tuple(self.vertices[-1])
+
+    def bb(self, pad=0):
+        left, bottom = self.baked.min(axis=0) - pad
+        right, top = self.baked.max(axis=0) + pad
+        return pymunk.BB(left, bottom, right, top)
+
+
+class ChunkedTerrain(object):
+    """
+    Endless terrain made of seeded chunks that are streamed in ahead of a
+    focus point and evicted once they fall far enough behind it.
+
+    Chunk i is generated from its own random stream seeded with (seed, i),
+    so any chunk can be rebuilt from a neighbour's endpoint without keeping
+    history around.
+    """
+    def __init__(self, space, seed=None, start=(-100, 100), segments_per_chunk=16,
+                 ahead=2000, behind=1000, radius=5, tolerance=5, friction=1.0, sprites=None):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+
+        self.space = space
+        self.seed = seed
+        self.segments_per_chunk = segments_per_chunk
+        self.ahead = ahead
+        self.behind = behind
+        self.radius = radius
+        self.tolerance = tolerance
+        self.friction = friction
+        self.sprites = sprites
+
+        self.chunks = deque()
+        self.chunks.append(self.build_chunk(0, np.asarray(start, dtype=float)))
+
+        # Read-only view of the loaded terrain for other threads. polylines and
+        # changes are replaced, never mutated, and version is bumped after them.
+        # changes holds (version, bounds of the chunks streamed in or out) for
+        # the last max_changes versions.
+        self.polylines = ()
+        self.changes = ()
+        self.max_changes = 32
+        self.version = 0
+        self.publish(self.chunks)
+
+    def offsets(self, index):
+        rng = np.random.default_rng((self.seed, index))
+        dx = rng.integers(100, 501, self.segments_per_chunk)
+        dy = rng.integers(-100, 101, self.segments_per_chunk)
+        return np.column_stack((dx, dy)).astype(float)
+
+    def build_chunk(self, index, start):
+        vertices = np.vstack((start, start + np.cumsum(self.offsets(index), axis=0)))
+
+        baked = bake_polyline(self.space, vertices, radius=self.radius,
+                              tolerance=self.tolerance, friction=self.friction)
+        if self.sprites is not None:
+            self.sprites.extend((shape.body, shape) for shape in baked.shapes)
+
+        return TerrainChunk(index, vertices, baked.shapes, baked.vertices)
+
+    def evict_chunk(self, chunk):
+        self.space.remove(*chunk.shapes)
+        if self.sprites is not None:
+            evicted = set(chunk.shapes)
+            self.sprites[:] = [s for s in self.sprites if s[1] not in evicted]
+
+    def publish(self, changed):
+        self.polylines = tuple(chunk.baked for chunk in self.chunks)
+        bounds = tuple(chunk.bb(self.radius) for chunk in changed)
+        self.changes = (self.changes + ((self.version + 1, bounds),))[-self.max_changes:]
+        self.version += 1
+
+    def changed_since(self, version):
+        """
+        Bounding boxes of the chunks streamed in or out after version, or
+        None if that is further back than the kept history.
+        """
+        changes = self.changes
+        if not changes or changes[0][0] > version + 1:
+            return None
+        return [bb for v, bounds in changes if v > version for bb in bounds]
+
+    def update(self, x):
+        """Stream chunks in and out so that [x - behind, x + ahead] is covered."""
+        loaded = list(self.chunks)
+
+        # ahead
+        while self.chunks[-1].end[0] < x + self.ahead:
+            last = self.chunks[-1]
+            self.chunks.append(self.build_chunk(last.index + 1, last.vertices[-1]))
+
+        # behind, walking back towards chunk 0 if the focus point reversed
+        while self.chunks[0].start[0] > x - self.behind and self.chunks[0].index > 0:
+            first = self.chunks[0]
+            index = first.index - 1
+            start = first.vertices[0] - self.offsets(index).sum(axis=0)
+            self.chunks.appendleft(self.build_chunk(index, start))
+
+        # evict chunks that are entirely out of range
+        while len(self.chunks) > 1 and self.chunks[0].end[0] < x - self.behind:
+            self.evict_chunk(self.chunks.popleft())
+        while len(self.chunks) > 1 and self.chunks[-1].start[0] > x + self.ahead:
+            self.evict_chunk(self.chunks.pop())
+
+        if list(self.chunks) != loaded:
+            self.publish(set(loaded).symmetric_difference(self.chunks))
+
+    def segments_in(self, bb):
+        """
+        Yield (a, b, radius) for every loaded segment whose bounding box
+        overlaps bb. Only reads the published polylines, so it is safe to
+        call from a thread other than the one streaming the terrain.
+        """
+        pad = self.radius
+        for vertices in self.polylines:
+            if vertices[-1, 0] + pad < bb.left or vertices[0, 0] - pad > bb.right:
+                continue
+            a = vertices[:-1]
+            b = vertices[1:]
+            overlap = ((np.maximum(a[:, 0], b[:, 0]) + pad >= bb.left) &
+                       (np.minimum(a[:, 0], b[:, 0]) - pad <= bb.right) &
+                       (np.maximum(a[:, 1], b[:, 1]) + pad >= bb.bottom) &
+                       (np.minimum(a[:, 1], b[:, 1]) - pad <= bb.top))
+            for i in np.flatnonzero(overlap):
+                yield tuple(a[i]), tuple(b[i]), self.radius
+
+    @property
+    def shape_count(self):
+        return sum(len(chunk.shapes) for chunk in self.chunks)
@@ -0,0 +1,66 @@
+import pyglet
+
+
+class HudLabel(object):
+    """
+    Label whose text comes from a format template. The label is only
+    re-laid-out when the formatted values actually change.
+    """
+    def __init__(self, label, template):
+        self.label = label
+        self.template = template
+        self.values = None
+
+    def set(self, *values):
+        if values != self.values:
+            self.values = values
+            self.label.text = self.template.format(*values)
+
+
+class TextLayer(object):
+    """
+    Shared text layer: HUD labels batched together, plus a pool of
+    world-anchored labels that are moved rather than recreated.
+    """
+    def __init__(self, label_class=pyglet.text.Label):
+        self.label_class = label_class
+        self.batch = pyglet.graphics.Batch()
+
+        self.hud = []
+        self.world_labels = {}
+        self.free_labels = []
+
+    def add_hud(self, template, *values, **kwargs):
+        label = self.label_class(template.format(*values), batch=self.batch, **kwargs)
+        hud_label = HudLabel(label, template)
+        hud_label.values = values
+        self.hud.append(hud_label)
+        return hud_label
+
+    def place(self, key, text, x, y, **kwargs):
+        """
+        Show text at (x, y) under the given key, reusing the key's label or a
+        released one. Keyword arguments only apply when a new label is made.
+        """
+        label = self.world_labels.get(key)
+        if label is None:
+            if self.free_labels:
+                label = self.free_labels.pop()
+            else:
+                label = self.label_class(text, x=x, y=y, batch=self.batch, **kwargs)
+            self.world_labels[key] = label
+
+        if label.text != text:
+            label.text = text
+        if label.position != (x, y):
+            label.position = (x, y)
+        return label
+
+    def release(self, key):
+        label = self.world_labels.pop(key, None)
+        if label is not None:
+            label.text = ""
+            self.free_labels.append(label)
+
+    def draw(self):
+        self.batch.draw()
@@ -0,0 +1,101 @@
+import time
+import queue
+import threading
+
+import numpy as np
+
+
+class Snapshot(object):
+    """Immutable (x, y, angle) rows for a fixed list of bodies after a step."""
+    __slots__ = ("tick", "state")
+
+    def __init__(self, tick, state):
+        state.flags.writeable = False
+        self.tick = tick
+        self.state = state
+
+    def pose(self, index):
+        return tuple(self.state[index])
+
+
+class PhysicsThread(threading.Thread):
+    """
+    Steps a pymunk space on a dedicated worker thread.
+
+    The worker owns the space: anything that touches it, including control
+    inputs, is sent in through a queue with send(func, *args) and runs on the
+    worker before the next step. After every step the worker captures the
+    poses of the given bodies into a new Snapshot and flips it into the
+    front of a front/back buffer pair, so the render loop can read the latest
+    snapshot without locking or touching the space. A snapshot is never
+    written to after it is published, however long the reader holds it.
+    """
+    def __init__(self, space, bodies, step=1.0 / 60.0, substeps=1, tick=None, realtime=True):
+        super().__init__(daemon=True)
+
+        self.space = space
+        self.bodies = list(bodies)
+        self.step = step
+        self.substeps = substeps
+        self.tick = tick
+        self.realtime = realtime
+
+        self.commands = queue.Queue()
+        self.stopped = threading.Event()
+
+        self.ticks = 0
+        self.step_time = 0.0 # wall time of the last step, in seconds
+
+        self.buffers = [self.capture(), None]
+        self.front = 0
+
+    def capture(self):
+        state = np.array([(b.position[0], b.position[1], b.angle) for b in self.bodies], dtype=float)
+        return Snapshot(self.ticks, state.reshape(-1, 3))
+
+    @property
+    def snapshot(self):
+        return self.buffers[self.front]
+
+    def send(self, func, *args):
+        self.commands.put((func, args))
+
+    def run_commands(self):
+        while True:
+            try:
+                func, args = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            func(*args)
+
+    def run(self):
+        next_time = time.perf_counter()
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+
+            self.run_commands()
+            if self.tick is not None:
+                self.tick(self.step)
+            substep = self.step / self.substeps
+            for _ in range(self.substeps):
+                self.space.step(substep)
+            self.ticks += 1
+
+            back = 1 - self.front
+            self.buffers[back] = self.capture()
+            self.front = back
+
+            now = time.perf_counter()
+            self.step_time = now - start
+            if self.realtime:
+                next_time += self.step
+                if next_time < now - self.step:
+                    # fell behind; don't try to catch up in a burst
+                    next_time = now
+                time.sleep(max(0.0, next_time - now))
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+        self.run_commands()
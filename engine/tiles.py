@@ -0,0 +1,108 @@
+import math
+from collections import OrderedDict
+
+import pymunk
+
+import pygame
+
+
+class TileCache(object):
+    """
+    Rasterizes static geometry into off-screen pygame surfaces keyed by world
+    tile coordinates, so that static terrain can be blitted instead of being
+    redrawn line by line every frame. Least recently used tiles are evicted
+    once more than max_tiles are cached.
+
+    By default static segments are found with space.bb_query. source(bb)
+    may instead yield (a, b, radius) tuples, e.g. ChunkedTerrain.segments_in,
+    which doesn't touch the space.
+
+    changes(version), e.g. ChunkedTerrain.changed_since, lets sync drop
+    only the tiles overlapping the bounding boxes that changed since the
+    cached version; without it, or when it returns None, sync drops them all.
+    """
+    def __init__(self, space, tile_size=256, max_tiles=64, color=(0, 255, 0), source=None, changes=None):
+        self.space = space
+        self.source = source if source is not None else self.static_segments_in
+        self.changes = changes
+        self.version = None
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.color = color
+
+        self.shape_filter = pymunk.ShapeFilter()
+        self.tiles = OrderedDict()
+
+        # counters for the last call to draw
+        self.rendered = 0
+        self.blitted = 0
+
+    def clear(self):
+        self.tiles.clear()
+
+    def sync(self, version):
+        """Drop the tiles whose geometry changed since the last sync."""
+        if version == self.version:
+            return
+        changed = None
+        if self.changes is not None and self.version is not None:
+            changed = self.changes(self.version)
+        self.version = version
+        if changed is None:
+            self.clear()
+            return
+        stale = [key for key in self.tiles
+                 if any(self.tile_bb(*key).intersects(bb) for bb in changed)]
+        for key in stale:
+            del self.tiles[key]
+
+    def static_segments_in(self, bb):
+        for shape in self.space.bb_query(bb, self.shape_filter):
+            if shape.body.body_type == pymunk.Body.STATIC and isinstance(shape, pymunk.Segment):
+                yield shape.a, shape.b, shape.radius
+
+    def tile_bb(self, i, j):
+        size = self.tile_size
+        return pymunk.BB(i * size, j * size, (i + 1) * size, (j + 1) * size)
+
+    def render_tile(self, i, j):
+        size = self.tile_size
+        surface = pygame.Surface((size, size), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+
+        left = i * size
+        top = (j + 1) * size
+        for a, b, radius in self.source(self.tile_bb(i, j)):
+            a = (a[0] - left, top - a[1])
+            b = (b[0] - left, top - b[1])
+            pygame.draw.line(surface, self.color, a, b, int(radius))
+
+        return surface
+
+    def get_tile(self, i, j):
+        key = (i, j)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+        surface = self.render_tile(i, j)
+        self.rendered += 1
+        self.tiles[key] = surface
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return surface
+
+    def draw(self, screen, bb, scroll):
+        """Blit every tile overlapping the world-space bb onto the screen."""
+        self.rendered = 0
+        self.blitted = 0
+
+        size = self.tile_size
+        height = screen.get_height()
+        for i in range(math.floor(bb.left / size), math.floor(bb.right / size) + 1):
+            for j in range(math.floor(bb.bottom / size), math.floor(bb.top / size) + 1):
+                x = i * size + scroll[0]
+                y = height - (j + 1) * size + scroll[1]
+                screen.blit(self.get_tile(i, j), (x, y))
+                self.blitted += 1
@@ -0,0 +1,91 @@
+import pymunk
+
+import numpy as np
+
+
+class SpriteTransformer(object):
+    """
+    Packs the local vertices of a list of (body, shape) sprites into one
+    array so that world and screen coordinates for every sprite can be
+    computed with a handful of vectorized operations per frame.
+
+    Circles contribute two points: their center and a point on the rim
+    used to show rotation.
+    """
+    def __init__(self, screen_height):
+        self.screen_height = screen_height
+        self.build([])
+
+    def build(self, sprites, version=None):
+        # lets callers tell whether the sprite list changed since the last build
+        self.version = version
+        self.bodies = []
+        body_indices = {}
+        local = []
+        owners = []
+        self.slices = {}
+
+        for body, shape in sprites:
+            if isinstance(shape, pymunk.Circle):
+                offset = shape.offset
+                points = [tuple(offset), (offset[0] + shape.radius, offset[1])]
+            elif isinstance(shape, pymunk.Poly):
+                points = [tuple(v) for v in shape.get_vertices()]
+            elif isinstance(shape, pymunk.Segment):
+                points = [tuple(shape.a), tuple(shape.b)]
+            else:
+                continue
+
+            if body not in body_indices:
+                body_indices[body] = len(self.bodies)
+                self.bodies.append(body)
+
+            start = len(local)
+            local += points
+            owners += [body_indices[body]] * len(points)
+            self.slices[shape] = (start, len(local))
+
+        self.local = np.array(local, dtype=float).reshape(-1, 2)
+        self.owners = np.array(owners, dtype=int)
+        self.world = np.empty_like(self.local)
+        self.screen = np.empty_like(self.local)
+
+    def update(self, scroll=(0, 0), pose=None, state=None):
+        """
+        Recompute world and screen coordinates of every packed vertex.
+        pose(body) may supply an (x, y, angle) to use instead of the body's
+        current one, e.g. FixedStepper.pose for interpolated drawing. state
+        may instead be an array of (x, y, angle) rows in the order of
+        self.bodies, e.g. from a PhysicsThread snapshot.
+        """
+        if not self.bodies:
+            return
+
+        if state is not None:
+            state = np.asarray(state)
+        elif pose is None:
+            state = np.array([(b.position[0], b.position[1], b.angle) for b in self.bodies])
+        else:
+            state = np.array([pose(b) for b in self.bodies])
+        angles = state[self.owners, 2]
+        cos = np.cos(angles)
+        sin = np.sin(angles)
+
+        x = self.local[:, 0]
+        y = self.local[:, 1]
+        self.world[:, 0] = x * cos - y * sin + state[self.owners, 0]
+        self.world[:, 1] = x * sin + y * cos + state[self.owners, 1]
+
+        self.screen[:, 0] = self.world[:, 0] + scroll[0]
+        self.screen[:, 1] = self.screen_height - self.world[:, 1] + scroll[1]
+
+    @property
+    def shapes(self):
+        return list(self.slices)
+
+    def screen_points(self, shape):
+        start, end = self.slices[shape]
+        return self.screen[start:end]
+
+    def __contains__(self, shape):
+        return shape in self.slices
@@ -1,149 +1,233 @@
+import sys
+import time
 import random
 import math
 
+from engine import headless # must come before pyglet.window
+from engine import checkpoint
+
 import pymunk
-from pymunk.pyglet_util import DrawOptions
 
 import pyglet
 from pyglet.window import key
 
-window = pyglet.window.Window(900, 600, "Pymunk Tester", resizable=False)
-keys = key.KeyStateHandler()
-options = DrawOptions()
+from engine.bake import bake_polyline
+from engine.history import RewindBuffer
+from engine.landers import TERRAIN, Hull, add_ground_handler, create_lander, generate_terrain, steering, thruster
+from engine.profiler import Profiler
+from engine.render import BatchRenderer
+from engine.replay import Recording, replay
+from engine.stepper import FixedStepper
+from engine.terrain import TerrainIndex
+from engine.text import TextLayer
+
+if headless.HEADLESS:
+    window = headless.NullWindow(900, 600)
+    keys = headless.ScriptedKeys([
+        (0, 0.01, {key.SPACE}),
+        (0, 3, {key.W}),
+        (3, 3.5, {key.A}),
+        (6, 12, {key.W}),
+        (20, 30, {key.W})
+    ])
+    Label = headless.NullLabel
+else:
+    window = pyglet.window.Window(900, 600, "Pymunk Tester", resizable=False)
+    keys = key.KeyStateHandler()
+    Label = pyglet.text.Label
+renderer = BatchRenderer()
+
+# --profile times each phase of a frame; --profile-json PATH also dumps the numbers at exit
+profile_path = headless.get_arg("profile-json", None, str)
+profiler = Profiler(enabled="--profile" in sys.argv or profile_path is not None)
 
 space = pymunk.Space()
 space.gravity = 0, -20
 
-def centroid(vertices):
-    sumx = 0
-    sumy = 0
-    for v in vertices:
-        sumx += v[0]
-        sumy += v[1]
-    return (sumx / len(vertices), sumy / len(vertices))
-
 # lander
-mass = 10000
-lander = pymunk.Body(mass)
-vertices = [(0, 0), (15, 30), (30, 0)]
-lander_shape = pymunk.Poly(lander, vertices)
-lander.moment = pymunk.moment_for_poly(mass, vertices)
-lander.center_of_gravity = centroid(vertices)
-lander.position = 450, 600
-lander.elasticity = 0.0
-lander.friction = 0.8
-steering = 3000000
-thruster = 1000000
-space.add(lander, lander_shape)
+lander, lander_shape = create_lander(space, 450, 600)
 
 fuel = 100
-integrity = 100
+hull = Hull()
+
+# seed
+# a replay or checkpoint brings its own seed; otherwise use --seed or pick one
+replay_path = headless.get_arg("replay", None, str)
+record_path = headless.get_arg("record", None, str)
+load_path = headless.get_arg("load", None, str)
+scene = None
+if replay_path is not None:
+    recording = Recording.load(replay_path)
+    seed = recording.seed
+elif load_path is not None:
+    recording = None
+    scene = checkpoint.load(load_path)
+    seed = scene.state["seed"]
+else:
+    recording = None
+    seed = headless.get_arg("seed", random.randrange(2 ** 32), int)
+rng = random.Random(seed)
 
 # terrain
-base = 20
-previous = (0, random.randint(0, 500) // 10 + base)
-segments = []
-slope_angles = []
-while previous[0] < 900:
-    x = random.randint(previous[0] + 10, previous[0] + 50)
-    y = 100 * math.sin(x) + 100 + base#random.randint(0, 500) // 5 + base
-    diff = (x - previous[0], y - previous[1])
-    angle = math.atan2(*diff)
-    slope_angles.append(angle)
-    shape = pymunk.Segment(space.static_body, previous, (x, y), 1)
-    shape.body.elasticity = 0.0
-    shape.body.friction = 1.0
-    space.add(shape)
-    segments.append(shape)
-    previous = x, y
-
-score_multiplier = min(slope_angles) / math.pi * 0.5
+terrain_vertices = generate_terrain(rng)
+baked_terrain = bake_polyline(space, terrain_vertices, radius=1, tolerance=1.0,
+                              collision_type=TERRAIN, elasticity=0.0, friction=1.0)
+segments = baked_terrain.shapes
+renderer.add_space(space)
+
+stepper = FixedStepper(space, step=1.0 / 60.0, substeps=1, max_steps=5, profiler=profiler)
+renderer.pose = stepper.pose
+
+# rewind
+rewind_seconds = 3
+
+def capture_game_state():
+    return fuel, hull.integrity, landed, landed_time
+
+def restore_game_state(state):
+    global fuel, landed, landed_time
+    fuel, hull.integrity, landed, landed_time = state
+
+history = RewindBuffer([lander], every=1, keyframe_every=60, max_bytes=256 * 1024,
+                       capture_extra=capture_game_state, restore_extra=restore_game_state)
+
+terrain = TerrainIndex(baked_terrain.vertices)
+
+def get_score_multiplier(x):
+    # flat ground scores 0.25, falling off as the ground under x gets steeper
+    return (math.pi * 0.5 - abs(terrain.slope_at(x))) / math.pi * 0.5
+
+score_multiplier = get_score_multiplier(lander.position.x)
+
+# ground contact and landing damage
+ground_handler = add_ground_handler(space, {lander: hull})
 
 # labels
-y_vel_label = pyglet.text.Label("Vertical Velocity: 0 mps",
-                                color=(255, 255, 255, 255),
-                                font_size=10,
-                                x=8, y=592,
-                                anchor_x='left', anchor_y='top'
-)
-x_vel_label = pyglet.text.Label("Horizontal Velocity: 0 mps",
-                                color=(255, 255, 255, 255),
-                                font_size=10,
-                                x=8, y=572,
-                                anchor_x='left', anchor_y='top'
-)
-rotation_label = pyglet.text.Label("Rotation: 0 degrees, 0 radians",
-                                color=(255, 255, 255, 255),
-                                font_size=10,
-                                x=8, y=552,
-                                anchor_x='left', anchor_y='top'
-)
-fuel_label = pyglet.text.Label("Fuel: 100%",
-                                color=(255, 255, 255, 255),
-                                font_size=10,
-                                x=8, y=532,
-                                anchor_x='left', anchor_y='top'
-)
-integrity_label = pyglet.text.Label("Lander Integrity: 100%",
-                                color=(255, 255, 255, 255),
-                                font_size=10,
-                                x=8, y=512,
-                                anchor_x='left', anchor_y='top'
-)
-score_label = pyglet.text.Label("Score: 0",
-                                color=(255, 255, 255, 255),
-                                font_size=24,
-                                x=window.width // 2, y=window.height // 2,
-                                anchor_x="center", anchor_y="center"
+text_layer = TextLayer(Label)
+hud_style = dict(color=(255, 255, 255, 255), font_size=10, x=8, anchor_x='left', anchor_y='top')
+y_vel_label = text_layer.add_hud("Vertical Velocity:\t{} mps", 0, y=592, **hud_style)
+x_vel_label = text_layer.add_hud("Horizontal Velocity:\t{} mps", 0, y=572, **hud_style)
+rotation_label = text_layer.add_hud("Rotation: {} degrees, {} radians", 0, 0, y=552, **hud_style)
+fuel_label = text_layer.add_hud("Fuel: {}%", 100, y=532, **hud_style)
+integrity_label = text_layer.add_hud("Lander Condition: {}%", 100, y=512, **hud_style)
+altitude_label = text_layer.add_hud("Altitude: {} m", 0, y=492, **hud_style)
+score_label = Label("Score: 0",
+                    color=(255, 255, 255, 255),
+                    font_size=24,
+                    x=window.width // 2, y=window.height // 2,
+                    anchor_x="center", anchor_y="center"
 )
 help_text = """
 Press Left/Right or A/D to use steering thrusters and Up or W to engage the main thruster. \n
 The lander must be moving at less than 4 mps for 5 seconds in order to use the landing gear. \n
+Press R to rewind 3 seconds. \n
 Press SPACE to begin.
 """
-help_text = pyglet.text.Label(help_text,
-                            color=(255, 255, 255, 255),
-                            font_size=16,
-                            x=window.width // 2, y=window.height // 2,
-                            anchor_x="center", anchor_y="bottom",
-                            multiline=True,
-                            width=400
+help_text = Label(help_text,
+                  color=(255, 255, 255, 255),
+                  font_size=16,
+                  x=window.width // 2, y=window.height // 2,
+                  anchor_x="center", anchor_y="bottom",
+                  multiline=True,
+                  width=400
+)
+profile_label = Label("",
+                      color=(255, 255, 0, 255),
+                      font_name="monospace", font_size=9,
+                      x=window.width - 8, y=window.height - 8,
+                      anchor_x="right", anchor_y="top",
+                      multiline=True,
+                      width=320
 )
 
 in_help_mode = True
 
 landed = False
 landed_time = 0
+score = 0
+
+# checkpoints
+# only the lander and game state are saved; the terrain comes back from the seed
+checkpoint_path = "lander.ckpt"
+
+def save_checkpoint(path):
+    state = {"seed": seed, "fuel": fuel, "integrity": hull.integrity, "landed": landed,
+             "landed_time": landed_time, "score": score}
+    return checkpoint.save(path, space, named={"lander": lander}, state=state, include_static=False)
+
+if scene is not None:
+    checkpoint.copy_body_state(scene.named["lander"], lander)
+    fuel = scene.state["fuel"]
+    hull.integrity = scene.state["integrity"]
+    landed = scene.state["landed"]
+    landed_time = scene.state["landed_time"]
+    score = scene.state["score"]
+    score_label.text = f"Score: {score}"
+    in_help_mode = False
+
+@window.event
+def on_key_press(symbol, modifiers):
+    if symbol == key.F5:
+        save_checkpoint(checkpoint_path).add_done_callback(checkpoint.report)
 
 @window.event
 def on_draw():
-    window.clear()
-    y_vel_label.draw()
-    x_vel_label.draw()
-    rotation_label.draw()
-    fuel_label.draw()
-    integrity_label.draw()
-    if landed:
-        score_label.draw()
-    if in_help_mode:
-        help_text.draw()
-    space.debug_draw(options)
-
-# history of frame length
-dts = []
+    with profiler.scope("draw"):
+        window.clear()
+        text_layer.draw()
+        if landed:
+            score_label.draw()
+        if in_help_mode:
+            help_text.draw()
+        renderer.draw()
+        if profiler.enabled:
+            profile_label.draw()
 
 # keys pressed last frame
 last_keys_pressed = set()
 
-def update(dt):
-    global fuel, integrity, landed, landed_time, in_help_mode
+def tick(dt):
+    global in_help_mode
+
+    with profiler.scope("input"):
+        window.push_handlers(keys)
+        if in_help_mode and keys[key.SPACE]:
+            in_help_mode = False
+
+        if in_help_mode:
+            stepper.paused = True
+            return
+
+        apply_input(dt)
+
+    if not landed:
+        with profiler.scope("hud"):
+            y_vel_label.set(round(lander.velocity.y))
+            x_vel_label.set(round(lander.velocity.x))
+            rotation_label.set(round(math.degrees(lander.angle)), round(lander.angle, 3))
+            fuel_label.set(round(fuel, 1))
+            integrity_label.set(round(hull.integrity, 1))
+            altitude = lander.position.y - terrain.height_at(lander.position.x)
+            altitude_label.set(round(altitude))
+
+    with profiler.scope("collision"):
+        check_landing(dt)
+
+    stepper.paused = landed
 
-    window.push_handlers(keys)
-    if in_help_mode and keys[key.SPACE]:
-        in_help_mode = False
+def apply_input(dt):
+    global fuel
 
-    if in_help_mode:
-        return
+    if keys[key.R]:
+        if key.R not in last_keys_pressed:
+            rewound = history.rewind(stepper.steps - round(rewind_seconds / dt))
+            if rewound is not None:
+                stepper.steps = rewound
+                stepper.snap()
+            last_keys_pressed.add(key.R)
+    elif key.R in last_keys_pressed:
+        last_keys_pressed.remove(key.R)
+    history.record(stepper.steps)
 
     if fuel > 0:
         if keys[key.W]:
@@ -178,34 +262,72 @@ def update(dt):
     elif lander.position.x < 0:
         lander.position.x = 900
 
-    if not landed:
-        y_vel_label.text = f"Vertical Velocity:\t{round(lander.velocity.y)} mps"
-        x_vel_label.text = f"Horizontal Velocity:\t{round(lander.velocity.x)} mps"
-        rotation_label.text = f"Rotation: {round(math.degrees(lander.angle))} degrees, {round(lander.angle, 3)} radians"
-        fuel_label.text = f"Fuel: {round(fuel, 1)}%"
-        integrity_label.text = f"Lander Condition: {round(integrity, 1)}%"
-    
-    colliding_with_ground = False
-    for seg in segments:
-        if len(lander_shape.shapes_collide(seg).points) > 0:
-            if lander.velocity.length > 4.0:
-                integrity -= lander.kinetic_energy * dt * 0.000005
-            colliding_with_ground = True
-    
+def check_landing(dt):
+    global landed, landed_time, score_multiplier, score
+
+    colliding_with_ground = hull.ground_contacts > 0
+
     if colliding_with_ground and round(lander.velocity.length) <= 4.0 and not landed:
         lander.velocity.x = 0
-        score = round((integrity * 1000 + fuel * 1000) * score_multiplier)
+        score_multiplier = get_score_multiplier(lander.position.x)
+        score = round((hull.integrity * 1000 + fuel * 1000) * score_multiplier)
         score_label.text = f"Score: {score}"
         landed_time += dt
         landed = landed_time > 5
     else:
         landed_time = 0
 
-    if not landed:
-        space.step(dt)
-    dts.append(dt)
+def update(dt):
+    profiler.add("frame", dt)
+    stepper.advance(dt, tick)
+    # the percentiles are only refreshed twice a second
+    if profiler.enabled and profiler.phase("frame").count % 30 == 0:
+        profile_label.text = "\n".join(profiler.lines())
+
+# recording and replay
+RECORDED_KEYS = (key.W, key.A, key.D, key.R, key.SPACE)
+
+def final_state():
+    return (lander.position.x, lander.position.y, fuel, hull.integrity, float(score))
+
+def recorded_update(dt):
+    recording.record(dt, keys)
+    update(dt)
 
 if __name__ == "__main__":
-    pyglet.clock.schedule_interval(update, 1.0 / 60.0)
-    pyglet.app.run()
-    print(1 / (sum(dts) / len(dts)))
\ No newline at end of file
+    if replay_path is not None:
+        start = time.perf_counter()
+        replay(recording, update, keys)
+        elapsed = time.perf_counter() - start
+        print(f"replayed {len(recording)} ticks in {round(elapsed, 3)} seconds "
+              f"({round(len(recording) / elapsed)} ticks/sec)")
+        if final_state() == recording.final:
+            print("final state matches the recording")
+        else:
+            print(f"final state {final_state()} does not match the recording {recording.final}")
+            sys.exit(1)
+        sys.exit()
+
+    if record_path is not None:
+        recording = Recording(seed, RECORDED_KEYS)
+        frame_update = recorded_update
+    else:
+        frame_update = update
+
+    if headless.HEADLESS:
+        stats = headless.run(frame_update, headless.get_arg("seconds", 60), keys=keys)
+        headless.report(stats)
+        print(baked_terrain.report())
+    else:
+        pyglet.clock.schedule_interval(frame_update, 1.0 / 60.0)
+        pyglet.app.run()
+
+    if profiler.enabled:
+        print("\n".join(profiler.lines()))
+    if profile_path is not None:
+        profiler.dump(profile_path)
+
+    if recording is not None:
+        recording.final = final_state()
+        recording.save(record_path)
+        print(f"recorded {len(recording)} ticks with seed {seed} to {record_path}")
@@ -1,14 +1,21 @@
 import time
 
+from engine import headless # must come before pyglet.window
+
 import pymunk
-from pymunk.pyglet_util import DrawOptions
 
 import pyglet
 
 from engine.body import Group, Body, Circle, Segment
+from engine.render import BatchRenderer
+from engine.stepper import FixedStepper
 
-window = pyglet.window.Window(900, 600, "Pymunk Tester", resizable=False)
-options = DrawOptions()
+if headless.HEADLESS:
+    window = headless.NullWindow(900, 600)
+else:
+    window = pyglet.window.Window(900, 600, "Pymunk Tester", resizable=False)
+renderer = BatchRenderer()
+renderer.attach()
 
 space = pymunk.Space()
 space.gravity = 0, -1000
@@ -27,23 +34,31 @@ space.add(pj)
 
 segments = Group()
 segments.add_all([
-    Segment((50, 50), (850, 50), 2, body_type=Body.STATIC),
-    Segment((50, 550), (50, 50), 2, body_type=Body.STATIC),
-    Segment((50, 550), (850, 550), 2, body_type=Body.STATIC),
-    Segment((850, 550), (850, 50), 2, body_type=Body.STATIC)
+    # the body sits at the segment's start; a and b only give its direction
+    Segment(50, 50, (50, 50), (850, 50), 2, body_type=Body.STATIC),
+    Segment(50, 550, (50, 550), (50, 50), 2, body_type=Body.STATIC),
+    Segment(50, 550, (50, 550), (850, 550), 2, body_type=Body.STATIC),
+    Segment(850, 550, (850, 550), (850, 50), 2, body_type=Body.STATIC)
 ])
 segments.set_attribute("elasticity", 0.98)
 segments.set_attribute("friction", 1.0)
 segments.add_to_space(space)
 
+stepper = FixedStepper(space)
+renderer.pose = stepper.pose
+
 @window.event
 def on_draw():
     window.clear()
-    space.debug_draw(options)
+    renderer.draw()
 
 def update(dt):
-    space.step(dt)
+    stepper.advance(dt)
 
 if __name__ == "__main__":
-    pyglet.clock.schedule_interval(update, 1.0 / 60.0)
-    pyglet.app.run()
\ No newline at end of file
+    if headless.HEADLESS:
+        stats = headless.run(update, headless.get_arg("seconds", 60))
+        headless.report(stats)
+    else:
+        pyglet.clock.schedule_interval(update, 1.0 / 60.0)
+        pyglet.app.run()
\ No newline at end of file
@@ -1,161 +1,158 @@
+import sys
 import math
 
+from engine import checkpoint, headless # must come before pyglet.window
+
 import pymunk
-from pymunk.pyglet_util import DrawOptions
-from pymunk.vec2d import Vec2d
 
 import pyglet
-
-window = pyglet.window.Window(900, 600, "Rocketry", resizable=False)
-options = DrawOptions()
+from pyglet.window import key
+
+from engine.profiler import Profiler
+from engine.render import BatchRenderer
+from engine.rocketry import Part, Engine, Rocket, load_part, part_state
+from engine.stepper import FixedStepper
+from engine.text import TextLayer
+
+if headless.HEADLESS:
+    window = headless.NullWindow(900, 600)
+    Label = headless.NullLabel
+else:
+    window = pyglet.window.Window(900, 600, "Rocketry", resizable=False)
+    Label = pyglet.text.Label
+renderer = BatchRenderer()
+
+# --profile times each phase of a frame; --profile-json PATH also dumps the numbers at exit
+profile_path = headless.get_arg("profile-json", None, str)
+profiler = Profiler(enabled="--profile" in sys.argv or profile_path is not None)
 
 space = pymunk.Space()
 space.gravity = 0, 0
 
-def centroid(vertices, weights=None):
-    num = len(vertices)
-    if weights is None:
-        weights = [1 / num] * num
-    
-    xsum = 0
-    ysum = 0
-    for i, v in enumerate(vertices):
-        xsum += v[0] * weights[i]
-        ysum += v[1] * weights[i]
-    
-    return (xsum, ysum)
-
-
-class Part:
-    STACKED = 0
-    RADIAL = 1
-
-    def __init__(self):
-        self.vertices = [(0, 0)]
-
-        self.mount = Part.STACKED
-
-        self.mass = 0
-        self.radial_size = 0 # only applies to circular parts
-        self.height = 0
-
-        self.impact_tolerance = 0 # mps
-        self.heat_tolerance = 0
-
-    def move_to(self, x, y):
-        self.vertices = [(v[0] + x, v[1] + y) for v in self.vertices]
-
-
-class Engine(Part):
-    def __init__(self):
-        super().__init__()
-
-        self.radial_size = 90
-        self.height = 180
-
-        self.mass = 150
-        self.burn = 8.8
-        self.burning = False
-        self.atm_thrust = 162.91
-        self.vac_thrust = 192.0
-
-    def engage(self):
-        self.burning = True
-
-    def get_impulse(self, dt):
-        if self.burning:
-            self.burn -= dt
-            bottom_left = self.vertices[0]
-            impulse_x = bottom_left[0] + self.radial_size // 2
-            impulse_y = bottom_left[1] - self.height // 2
-            return (impulse_x, impulse_y, self.atm_thrust)
-        else:
-            return (0, 0, 0)
-
-
-class Rocket:
-    def __init__(self):
-        self.parts = []
-
-    def add_part(self, part):
-        self.parts.append(part)
-
-    def get_body_and_shape(self):
-        # compile part data
-        vertices = []
-        mass = 0
-        centroids_map = {}
-        for p in self.parts:
-            vertices += p.vertices
-            mass += p.mass
-            centroids_map[centroid(p.vertices)] = p.mass
-
-        # calculate center of mass
-        weighted_centroids_map = {c: m / mass for c, m in centroids_map.items()}
-        centroids = list(weighted_centroids_map.keys())
-        weights = [weighted_centroids_map[c] for c in centroids]
-        com = centroid(centroids, weights)
-
-        # calculate offset
-        vertices = list(set(vertices))
-        center = centroid(vertices)
-        offset = Vec2d(center) - Vec2d(com)
-
-        # create body
-        body = pymunk.Body(mass)
-        shape = pymunk.Poly(body, vertices)
-        body.moment = pymunk.moment_for_poly(mass, vertices)
-        body.center_of_gravity = com
-        body.position = 450, 300
-
-        return body, shape, body.local_to_world(com)
-
-pod = Part()
-pod.vertices = [(0, 0), (45, 90), (90, 0)]
-pod.mass = 10
-
-engine = Engine()
-engine.vertices = [(0, 0), (0, -engine.height), (engine.radial_size, -engine.height), (engine.radial_size, 0)]
-engine.engage()
-
-rocket = Rocket()
-rocket.parts = [pod, engine]
-
-body, shape, com = rocket.get_body_and_shape()
-space.add(body, shape)
-
-label = pyglet.text.Label("Center Of Mass",
-                          font_size=8,
-                          x=com[0], y=com[1],
-                          anchor_x="center", anchor_y="center")
+def build_vessel(parts):
+    vessel = Rocket()
+    for part in parts:
+        vessel.add_part(part)
+    vessel.get_body_and_shapes()
+    return vessel
+
+# a checkpoint brings its vessels, staged or not; otherwise build the rocket
+load_path = headless.get_arg("load", None, str)
+scene = None
+if load_path is not None:
+    scene = checkpoint.load(load_path)
+    vessels = [build_vessel([load_part(state) for state in parts]) for parts in scene.state["vessels"]]
+    for i, vessel in enumerate(vessels):
+        checkpoint.copy_body_state(scene.named[f"vessel{i}"], vessel.body)
+else:
+    pod = Part()
+    pod.vertices = [(0, 0), (45, 90), (90, 0)]
+    pod.mass = 10
+
+    engine = Engine()
+    engine.vertices = [(0, 0), (0, -engine.height), (engine.radial_size, -engine.height), (engine.radial_size, 0)]
+    engine.engage()
+
+    vessels = [build_vessel([pod, engine])]
+
+for vessel in vessels:
+    space.add(vessel.body, *vessel.shapes)
+rocket = vessels[0]
+body = rocket.body
+com = body.local_to_world(rocket.center_of_mass)
+engine = next(part for vessel in vessels for part in vessel.parts if isinstance(part, Engine))
+# the engine's body is its own once it has been staged
+engine_body = next(vessel.body for vessel in vessels if engine in vessel.parts)
+renderer.add_space(space)
+
+stepper = FixedStepper(space, profiler=profiler)
+if scene is not None:
+    stepper.steps = scene.state["steps"]
+renderer.pose = stepper.pose
+
+text_layer = TextLayer(Label)
+marker_style = dict(font_size=8, anchor_x="center", anchor_y="center")
+text_layer.place("com", "Center Of Mass", com[0], com[1], **marker_style)
 x, y = body.local_to_world((45, 90))
-label2 = pyglet.text.Label("(45, 90)",
-                          font_size=8,
-                          x=x, y=y,
-                          anchor_x="center", anchor_y="center")
+text_layer.place("marker", "(45, 90)", x, y, **marker_style)
+profile_label = Label("",
+                      color=(255, 255, 0, 255),
+                      font_name="monospace", font_size=9,
+                      x=window.width - 8, y=window.height - 8,
+                      anchor_x="right", anchor_y="top",
+                      multiline=True,
+                      width=320
+)
         
 
 @window.event
 def on_draw():
-    window.clear()
-    space.debug_draw(options)
-    label.draw()
-    label2.draw()
+    with profiler.scope("draw"):
+        window.clear()
+        renderer.draw()
+        text_layer.draw()
+        if profiler.enabled:
+            profile_label.draw()
+
+# staging: S drops the engine, as does --stage-at SECONDS
+stage_at = headless.get_arg("stage-at", None)
+
+def stage_engine():
+    global engine_body
+    if engine_body is not body:
+        return
+    booster = rocket.stage([engine])
+    for shape in booster.shapes:
+        # the shape moved to a new body, so the renderer has to repack it
+        renderer.remove(shape)
+        renderer.add(shape)
+    engine_body = booster.body
+    vessels.append(booster)
+
+# checkpoints: F5 saves every vessel with its parts, --load PATH restores them
+checkpoint_path = "rocket.ckpt"
+
+def save_checkpoint(path):
+    state = {"vessels": [[part_state(part) for part in vessel.parts] for vessel in vessels],
+             "steps": stepper.steps}
+    named = {f"vessel{i}": vessel.body for i, vessel in enumerate(vessels)}
+    return checkpoint.save(path, space, named=named, state=state)
 
-def update(dt):
-    global label2
+@window.event
+def on_key_press(symbol, modifiers):
+    if symbol == key.S:
+        stage_engine()
+    elif symbol == key.F5:
+        save_checkpoint(checkpoint_path).add_done_callback(checkpoint.report)
+
+def tick(dt):
+    if stage_at is not None and stepper.steps * dt >= stage_at:
+        stage_engine()
 
-    impulse_x, impulse_y, impulse_amount = engine.get_impulse(dt)
-    x, y = body.local_to_world((impulse_x, impulse_y))
-    label2 = pyglet.text.Label("Impulse",
-                          font_size=8,
-                          x=x, y=y,
-                          anchor_x="center", anchor_y="center")
+    with profiler.scope("thrust"):
+        for vessel in vessels:
+            vessel.fire(dt)
 
-    impulse_x, impulse_y, impulse_amount = engine.get_impulse(dt)
-    body.apply_impulse_at_local_point((0, impulse_amount), (impulse_x, impulse_y))
-    space.step(dt)
+    with profiler.scope("hud"):
+        x, y = engine_body.local_to_world(engine.mount_point)
+        text_layer.place("marker", "Impulse", x, y)
+
+def update(dt):
+    profiler.add("frame", dt)
+    stepper.advance(dt, tick)
+    # the percentiles are only refreshed twice a second
+    if profiler.enabled and profiler.phase("frame").count % 30 == 0:
+        profile_label.text = "\n".join(profiler.lines())
 
 if __name__ == "__main__":
-    pyglet.clock.schedule_interval(update, 1.0 / 60.0)
-    pyglet.app.run()
+    if headless.HEADLESS:
+        stats = headless.run(update, headless.get_arg("seconds", 60))
+        headless.report(stats)
+    else:
+        pyglet.clock.schedule_interval(update, 1.0 / 60.0)
+        pyglet.app.run()
+
+    if profiler.enabled:
+        print("\n".join(profiler.lines()))
+    if profile_path is not None:
+        profiler.dump(profile_path)
@@ -1,6 +1,5 @@
 import math
 import sys
-import random
 
 import pymunk
 from pymunk.vec2d import Vec2d
@@ -11,245 +10,120 @@ from pygame.locals import *
 
 import numpy as np
 
-def create_pogo(space, x, y):
-    pos = Vec2d(x, y)
+from engine import checkpoint, headless, rovers
+from engine.camera import Camera
+from engine.history import RewindBuffer
+from engine.profiler import Profiler
+from engine.rovers import POGO, POGO1, max_speed
+from engine.stepper import FixedStepper
+from engine.telemetry import Telemetry
+from engine.terrain import ChunkedTerrain
+from engine.tiles import TileCache
+from engine.threaded import PhysicsThread
+from engine.transform import SpriteTransformer
 
-    # carriage
-    mass = 100
-    size = (50, 30)
-    moment = pymunk.moment_for_box(mass, size)
-    carriage_b = pymunk.Body(mass, moment)
-    carriage_s = pymunk.Poly.create_box(carriage_b, size)
-    carriage_s.color = 255, 0, 0
-    carriage_s.friction = 0.4
-    space.add(carriage_b, carriage_s)
-    sprites.append((carriage_b, carriage_s))
 
-    carriage_b.position = pos
+def create_pogo(space, x, y):
+    return POGO.spawn(space, x, y, sprites)["carriage"]
 
 def create_pogo1(space, x, y):
-    pos = Vec2d(x, y)
-
-    # carriage
-    mass = 100
-    size = (50, 30)
-    moment = pymunk.moment_for_box(mass, size)
-    carriage_b = pymunk.Body(mass, moment)
-    carriage_s = pymunk.Poly.create_box(carriage_b, size)
-    carriage_s.color = 255, 0, 0
-    space.add(carriage_b, carriage_s)
-    sprites.append((carriage_b, carriage_s))
-
-    # left leg
-    mass = 20
-    left_leg_b = pymunk.Body(mass)
-    size = (10, 100)
-    left_leg_s = pymunk.Poly.create_box(left_leg_b, size)
-    left_leg_s.color = 255, 0, 0
-    space.add(left_leg_b, left_leg_s)
-    sprites.append((left_leg_b, left_leg_s))
-
-
-    # right leg
-    mass = 20
-    right_leg_b = pymunk.Body(mass)
-    size = (10, 100)
-    right_leg_s = pymunk.Poly.create_box(right_leg_b, size)
-    right_leg_s.color = 255, 0, 0
-    space.add(right_leg_b, right_leg_s)
-    sprites.append((right_leg_b, right_leg_s))
-
-    # left wheel
-    mass = 10
-    radius = 10
-    moment = pymunk.moment_for_circle(mass, 0, radius)
-    wheel1_b = pymunk.Body(mass, moment)
-    wheel1_s = pymunk.Circle(wheel1_b, radius)
-    wheel1_s.friction = 1.0
-    wheel1_s.color = 0, 0, 0
-    space.add(wheel1_b, wheel1_s)
-    sprites.append((wheel1_b, wheel1_s))
-
-    # right wheel
-    mass = 10
-    radius = 10
-    moment = pymunk.moment_for_circle(mass, 0, radius)
-    wheel2_b = pymunk.Body(mass, moment)
-    wheel2_s = pymunk.Circle(wheel2_b, radius)
-    wheel2_s.friction = 1.0
-    wheel2_s.color = 0, 0, 0
-    space.add(wheel2_b, wheel2_s)
-    sprites.append((wheel2_b, wheel2_s))
-
-    # stick
-    mass = 20
-    size = (40, 150)
-    stick_b = pymunk.Body(mass)
-    stick_s = pymunk.Poly.create_box(stick_b, size)
-    stick_s.color = 0, 0, 255
-    space.add(stick_b, stick_s)
-    sprites.append((stick_b, stick_s))
-
-    carriage_b.position = pos + (0, 100)
-    left_leg_b.position = pos + (-25, 50)
-    right_leg_b.position = pos + (25, 50)
-    wheel1_b.position = pos + (-25, -50)
-    wheel2_b.position = pos + (25, -50)
-    stick_b.position = pos + (0, -50)
-
-    space.add([
-        pymunk.PinJoint(carriage_b, left_leg_b, (0, 0), (0, 100)),
-        pymunk.PinJoint(carriage_b, left_leg_b, (25, 0), (0, 100)),
-
-        pymunk.PinJoint(carriage_b, right_leg_b, (0, 0), (0, 100)),
-        pymunk.PinJoint(carriage_b, right_leg_b, (25, 0), (0, 100)),
-
-        pymunk.PinJoint(left_leg_b, wheel1_b, (5, 0), (0, 0)),
-        pymunk.PinJoint(right_leg_b, wheel2_b, (5, 0), (0, 0))
-    ])
-
-    return carriage_b
-
+    return POGO1.spawn(space, x, y, sprites)["carriage"]
 
 def create_rover(space, x, y):
-    pos = Vec2d(x, y)
-
-    wheel_color = 0, 0, 0
-
-    # first wheel
-    mass = 10
-    radius = 25
-    moment = pymunk.moment_for_circle(mass, 20, radius)
-    wheel1_b = pymunk.Body(mass, moment)
-    wheel1_s = pymunk.Circle(wheel1_b, radius)
-    wheel1_s.friction = 1.5
-    wheel1_s.color = wheel_color
-    space.add(wheel1_b, wheel1_s)
-    sprites.append((wheel1_b, wheel1_s))
-
-    # second wheel
-    mass = 10
-    radius = 25
-    moment = pymunk.moment_for_circle(mass, 20, radius)
-    wheel2_b = pymunk.Body(mass, moment)
-    wheel2_s = pymunk.Circle(wheel2_b, radius)
-    wheel2_s.friction = 1.5
-    wheel2_s.color = wheel_color
-    space.add(wheel2_b, wheel2_s)
-    sprites.append((wheel2_b, wheel2_s))
-
-    # third wheel
-    mass = 10
-    radius = 25
-    moment = pymunk.moment_for_circle(mass, 20, radius)
-    wheel3_b = pymunk.Body(mass, moment)
-    wheel3_s = pymunk.Circle(wheel3_b, radius)
-    wheel3_s.friction = 1.5
-    wheel3_s.color = wheel_color
-    space.add(wheel3_b, wheel3_s)
-    sprites.append((wheel3_b, wheel3_s))
-
-    # chassis
-    mass = 100
-    size = (50, 30)
-    moment = pymunk.moment_for_box(mass, size)
-    chassis_b = pymunk.Body(mass, moment)
-    chassis_s = pymunk.Poly.create_box(chassis_b, size)
-    space.add(chassis_b, chassis_s)
-    sprites.append((chassis_b, chassis_s))
-
-    # plow
-    mass = 50
-    vertices = [(0, 0), (0, 50), (25, 0)]
-    moment = pymunk.moment_for_poly(mass, vertices)
-    plow_b = pymunk.Body(mass, moment)
-    plow_s = pymunk.Poly(plow_b, vertices)
-    space.add(plow_b, plow_s)
-    sprites.append((plow_b, plow_s))
-
-    wheel1_b.position = pos + (-55, 0)
-    wheel2_b.position = pos + (55, 0)
-    wheel3_b.position = pos + (0, 90)
-    chassis_b.position = pos + (0, 30)
-    plow_b.position = pos + (95, -20)
-
-    space.add(
-        pymunk.PinJoint(wheel1_b, chassis_b, (0, 0), (-25, -15)),
-        pymunk.PinJoint(wheel1_b, chassis_b, (0, 0), (-25,  15)),
-        pymunk.PinJoint(wheel2_b, chassis_b, (0, 0), (25,  -15)),
-        pymunk.PinJoint(wheel2_b, chassis_b, (0, 0), (25,   15)),
-        pymunk.PinJoint(wheel3_b, chassis_b, (0, 0), (-25, 15)),
-        pymunk.PinJoint(wheel3_b, chassis_b, (0, 0), (25, 15)),
-        pymunk.PinJoint(chassis_b, plow_b, (25, 25), (0, 50)),
-        pymunk.PinJoint(wheel2_b, plow_b, (0, 0), (0, 0)),
-        pymunk.PinJoint(wheel2_b, plow_b, (0, 0), (0, 50))
-    )
-
-    speed = 0
-    motors = [
-        pymunk.SimpleMotor(wheel1_b, chassis_b, speed),
-        pymunk.SimpleMotor(wheel2_b, chassis_b, speed),
-        pymunk.SimpleMotor(wheel3_b, chassis_b, speed)
-    ]
-    space.add(*motors)
-    return motors, chassis_b
+    return rovers.create_rover(space, x, y, sprites)
 
 fps = 60
-pygame.init()
-screen = pygame.display.set_mode((900, 600))
+if headless.HEADLESS:
+    screen = pygame.Surface((900, 600))
+    keys = headless.ScriptedKeys([
+        (0, 10, {K_d}),
+        (10, 12, {K_a}),
+        (12, 30, {K_d})
+    ])
+else:
+    pygame.init()
+    screen = pygame.display.set_mode((900, 600))
 screen_rect = screen.get_rect()
 clock = pygame.time.Clock()
 
-draw_options = DrawOptions(screen)
+# --profile times each phase of a frame; --profile-json PATH also dumps the numbers at exit
+profile_path = headless.get_arg("profile-json", None, str)
+profiler = Profiler(enabled="--profile" in sys.argv or profile_path is not None)
+if profiler.enabled:
+    pygame.font.init()
+    profile_font = pygame.font.SysFont("monospace", 12)
 
-space = pymunk.Space()
-space.gravity = 0, -1000
+draw_options = DrawOptions(screen)
 
 sprites = []
-
-previous = (-100, 100)
-
-while previous[0] < 9000:
-    x = previous[0] + random.randint(100, 500)
-    y = previous[1] + random.randint(-100, 100)
-
-    floor = pymunk.Segment(space.static_body, previous, (x, y), 5)
-    floor.friction = 1.0
-    space.add(floor)
-    sprites.append((floor.body, floor))
-
-    previous = (x, y)
-
-pog_car = create_pogo(space, 400, 600)
-create_pogo(space, 400, 500)
-create_pogo(space, 400, 700)
-
-motors, car = create_rover(space, 200, 600)
 acc = 8
 dec = 8
-max_speed = 20
-motor_speed = 0
+
+checkpoint_path = "rover.ckpt"
+load_path = headless.get_arg("load", None, str)
+if load_path is not None:
+    # the terrain isn't saved; it is regenerated from the seed
+    scene = checkpoint.load(load_path)
+    space = scene.space
+    sprites += [(shape.body, shape) for shape in scene.shapes]
+    car = scene.named["car"]
+    motors = [scene.named[f"motor{i}"] for i in range(3)]
+    motor_speed = scene.state["motor_speed"]
+    terrain = ChunkedTerrain(space, seed=scene.state["seed"], sprites=sprites)
+    terrain.update(car.position.x)
+else:
+    space = pymunk.Space()
+    space.gravity = 0, -1000
+
+    seed = headless.get_arg("seed", None)
+    terrain = ChunkedTerrain(space, seed=None if seed is None else int(seed), sprites=sprites)
+    terrain.update(200)
+
+    pog_car = create_pogo(space, 400, 600)
+    create_pogo(space, 400, 500)
+    create_pogo(space, 400, 700)
+
+    motors, car = create_rover(space, 200, 600)
+    motor_speed = 0
+
+def save_checkpoint(path):
+    named = {"car": car}
+    named.update((f"motor{i}", m) for i, m in enumerate(motors))
+    state = {"seed": terrain.seed, "motor_speed": motor_speed}
+    return checkpoint.save(path, space, named=named, state=state, include_static=False)
+
+# substeps keep the pin-jointed rigs stable
+stepper = FixedStepper(space, step=1.0 / 60.0, substeps=2, max_steps=4, profiler=profiler)
+# with --threaded the space is stepped on a worker thread instead
+threaded = "--threaded" in sys.argv
+physics = None
+
+# --telemetry samples solver load between steps; --telemetry-json PATH dumps the history at exit
+telemetry_path = headless.get_arg("telemetry-json", None, str)
+telemetry = None
+if "--telemetry" in sys.argv or telemetry_path is not None:
+    telemetry = Telemetry(space)
 
 scroll = Vec2d(0, 0)
+camera = Camera(screen_rect.width, screen_rect.height)
+# static terrain is drawn from the tile cache, so only dynamic sprites are transformed
+transformer = SpriteTransformer(screen_rect.height)
+transformer.build([s for s in sprites if s[0].body_type != pymunk.Body.STATIC])
+car_index = transformer.bodies.index(car)
+tiles = TileCache(space, source=terrain.segments_in, changes=terrain.changed_since)
+
+# R rewinds the rover and pogos by a few seconds
+rewind_seconds = 3
+rewinding = False
 
 t = 0
 
 frames = []
 
-running = True
-while running:
-    dt = clock.tick(fps) * 0.001
+def control(dt):
+    global motor_speed, t
     t += dt
 
-    for evt in pygame.event.get():
-        if evt.type == QUIT:
-            pygame.quit()
-            running = False
-    
-    if not running:
-        break
-
-    keys = pygame.key.get_pressed()
     if keys[K_d]:
         motor_speed -= acc * dt
         motor_speed = max(motor_speed, -max_speed)
@@ -262,36 +136,178 @@ while running:
         if math.copysign(1, motor_speed) != sign:
             motor_speed = 0
 
+def set_motor_rate(rate):
     for m in motors:
-        m.rate = motor_speed
+        m.rate = rate
+
+def physics_tick(dt):
+    # runs on the physics thread
+    history.record(physics.ticks)
+    terrain.update(car.position.x)
+    if telemetry is not None:
+        telemetry.record(physics.ticks)
+
+def get_motor_speed():
+    return motor_speed
+
+def restore_motor_speed(speed):
+    global motor_speed
+    motor_speed = speed
+
+history = RewindBuffer(transformer.bodies, every=2, keyframe_every=30, max_bytes=512 * 1024,
+                       capture_extra=get_motor_speed, restore_extra=restore_motor_speed)
+
+# set while a rewind is queued for the physics thread; input waits for it,
+# so a motor rate from before the rewind can't be applied after it
+rewind_pending = False
+
+def rewind_physics(steps):
+    # runs on the physics thread
+    global rewind_pending
+    rewound = history.rewind(physics.ticks - steps)
+    if rewound is not None:
+        physics.ticks = rewound
+    set_motor_rate(motor_speed)
+    rewind_pending = False
+
+def rewind():
+    global rewinding, rewind_pending
+    if keys[K_r]:
+        if not rewinding:
+            steps = round(rewind_seconds / stepper.step)
+            if physics is not None:
+                rewind_pending = True
+                physics.send(rewind_physics, steps)
+            else:
+                rewound = history.rewind(stepper.steps - steps)
+                if rewound is not None:
+                    stepper.steps = rewound
+                    stepper.snap()
+        rewinding = True
+    else:
+        rewinding = False
+
+def update(dt):
+    profiler.add("frame", dt)
+    with profiler.scope("input"):
+        control(dt)
+        rewind()
+        set_motor_rate(motor_speed)
+    with profiler.scope("terrain"):
+        terrain.update(car.position.x)
+    stepper.advance(dt, step_tick)
+
+def step_tick(step):
+    history.record(stepper.steps)
+    if telemetry is not None:
+        telemetry.record(stepper.steps)
+
+profile_lines = []
+
+def draw_profile():
+    # the percentiles are only refreshed twice a second
+    if not profile_lines or profiler.phase("frame").count % 30 == 0:
+        profile_lines[:] = [profile_font.render(line, True, (0, 0, 0)) for line in profiler.lines()]
+    for i, line in enumerate(profile_lines):
+        screen.blit(line, (screen_rect.width - 330, 8 + i * 14))
+
+def draw(snapshot=None):
+    with profiler.scope("draw"):
+        draw_scene(snapshot)
+    if profiler.enabled:
+        draw_profile()
+
+def draw_scene(snapshot=None):
+    global scroll
+    if snapshot is None:
+        car_x, car_y, _ = stepper.pose(car)
+    else:
+        car_x, car_y, _ = snapshot.pose(car_index)
+    scroll = Vec2d(screen_rect.center) - to_pygame((car_x, car_y), screen)
 
-    space.step(dt)
-    scroll = Vec2d(screen_rect.center) - to_pygame(car.position, screen)
+    camera.look_at((car_x, car_y))
+    if snapshot is None:
+        transformer.update(scroll, stepper.pose)
+        visible = camera.cull(space, len(sprites))
+    else:
+        # the space belongs to the physics thread, so skip the bb_query
+        transformer.update(scroll, state=snapshot.state)
+        visible = transformer.shapes
 
     screen.fill(pygame.color.THECOLORS["white"])
-    
-    for body, shape in sprites:
+
+    tiles.sync(terrain.version)
+    tiles.draw(screen, camera.bb, scroll)
+    for shape in visible:
+        if shape not in transformer:
+            continue
+        points = transformer.screen_points(shape).tolist()
         if isinstance(shape, pymunk.Circle):
-            screen_center = to_pygame(body.position, screen) + scroll
-            pygame.draw.circle(screen, (0, 0, 0), screen_center, shape.radius)
-            edge = to_pygame(body.position + Vec2d(shape.radius, 0).rotated(body.angle), screen) + scroll
-            pygame.draw.line(screen, (255, 255, 255), screen_center, edge)
+            pygame.draw.circle(screen, (0, 0, 0), points[0], shape.radius)
+            pygame.draw.line(screen, (255, 255, 255), *points)
         elif isinstance(shape, pymunk.Poly):
-            vertices = shape.get_vertices()
-            transformed_vertices = [v.rotated(body.angle) + body.position for v in vertices]
-            try:
-                screen_vertices = [to_pygame(v, screen) + scroll for v in transformed_vertices]
-            except Exception as e:
-                print(body.angle)
-                print(vertices)
-                print(transformed_vertices)
-                raise e
-            pygame.draw.polygon(screen, (255, 0, 0), screen_vertices)
+            pygame.draw.polygon(screen, (255, 0, 0), points)
         elif isinstance(shape, pymunk.Segment):
-            vertices = shape.a, shape.b
-            transformed_vertices = [v.rotated(body.angle) + body.position for v in vertices]
-            screen_vertices = [to_pygame(v, screen) + scroll for v in transformed_vertices]
-            pygame.draw.line(screen, (0, 255, 0), *screen_vertices, int(shape.radius))
+            pygame.draw.line(screen, (0, 255, 0), *points, int(shape.radius))
     # space.debug_draw(draw_options)
 
-    pygame.display.flip()
+def report():
+    if profiler.enabled:
+        print("\n".join(profiler.lines()))
+    if profile_path is not None:
+        profiler.dump(profile_path)
+    if telemetry is not None:
+        print("\n".join(telemetry.lines()))
+    if telemetry_path is not None:
+        telemetry.dump(telemetry_path)
+
+if __name__ == "__main__":
+    if headless.HEADLESS:
+        stats = headless.run(update, headless.get_arg("seconds", 60), keys=keys)
+        headless.report(stats)
+        report()
+        sys.exit()
+
+    if threaded:
+        physics = PhysicsThread(space, transformer.bodies, step=stepper.step,
+                                substeps=stepper.substeps, tick=physics_tick)
+        physics.start()
+
+    running = True
+    while running:
+        dt = clock.tick(fps) * 0.001
+
+        for evt in pygame.event.get():
+            if evt.type == QUIT:
+                pygame.quit()
+                running = False
+            elif evt.type == KEYDOWN and evt.key == K_F5 and not threaded:
+                save_checkpoint(checkpoint_path).add_done_callback(checkpoint.report)
+        
+        if not running:
+            break
+
+        keys = pygame.key.get_pressed()
+        if threaded:
+            profiler.add("frame", dt)
+            if not rewind_pending:
+                control(dt)
+                rewind()
+                if not rewind_pending:
+                    physics.send(set_motor_rate, motor_speed)
+            draw(physics.snapshot)
+            pygame.display.set_caption(f"Rover - physics: {round(physics.step_time * 1000, 2)} ms/step")
+        else:
+            update(dt)
+            draw()
+            caption = f"Rover - drawn: {camera.drawn}, culled: {camera.culled}"
+            if telemetry is not None and telemetry.count:
+                latest = telemetry.latest()
+                caption += f", arbiters: {int(latest['arbiters'])}, contacts: {int(latest['contacts'])}"
+            pygame.display.set_caption(caption)
+
+        pygame.display.flip()
+
+    if physics is not None:
+        physics.stop()
+    report()
@@ -0,0 +1,6 @@
+import os
+
+# engine.body imports pyglet, which must not look for a display
+os.environ.setdefault("HEADLESS", "1")
+
+from engine import headless
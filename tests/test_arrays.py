@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import pymunk
+
+from engine.arrays import BodyArray
+from engine.body import Group, Body, Circle, Polygon
+
+
+def test_refresh_after_membership_change():
+    group = Group()
+    first = Circle(0, 0, 5)
+    group.add(first)
+    array = BodyArray(group)
+    assert len(array) == 1
+
+    second = Circle(10, 20, 5, mass=3)
+    second.body.velocity = 1, 2
+    group.add(second)
+    array.refresh()
+    assert len(array) == 2
+    assert array.position.tolist() == [[0, 0], [10, 20]]
+    assert array.velocity.tolist() == [[0, 0], [1, 2]]
+    assert array.mass.tolist() == [1, 3]
+
+    group.remove(first)
+    array.refresh()
+    assert array.bodies == [second.body]
+
+
+def test_apply_impulse_repeats_and_static():
+    group = Group()
+    group.add_all([Circle(0, 0, 5, mass=2), Circle(20, 0, 5, mass=4),
+                   Circle(40, 0, 5, body_type=Body.STATIC)])
+    array = BodyArray(group)
+    # set after the last refresh, so apply_impulse has to read it back
+    array.bodies[1].velocity = 0, 5
+
+    array.apply_impulse([(2, 0), (2, 0), (4, 0), (9, 9)], indices=[0, 0, 1, 2])
+    assert array.bodies[0].velocity == (2, 0)
+    assert array.bodies[1].velocity == (1, 5)
+    assert array.bodies[2].velocity == (0, 0)
+    assert array.velocity[2].tolist() == [0, 0]
+
+
+def test_pose_with_offset_center_of_gravity():
+    group = Group()
+    polygon = Polygon(100, 100, [(0, 0), (20, 0), (20, 10), (10, 10), (10, 20), (0, 20)])
+    group.add(polygon)
+    body = polygon.body
+    assert body.center_of_gravity != (0, 0)
+    array = BodyArray(group)
+
+    array.angle[:] = 1.0
+    array.position[:] = 50, 60
+    array.write()
+    assert body.angle == 1.0
+    assert tuple(body.position) == pytest.approx((50, 60))
+
+    array.teleport([(-30, 40)])
+    assert body.angle == 1.0
+    assert tuple(body.position) == pytest.approx((-30, 40))
+
+    array.refresh()
+    assert np.allclose(array.position, [(-30, 40)])
+    assert np.allclose(array.angle, [1.0])
@@ -0,0 +1,202 @@
+import json
+
+import numpy as np
+import pytest
+
+import pymunk
+
+from engine import checkpoint
+from engine.body import Group, Body, Circle, Polygon, Rectangle, Segment
+
+
+def build_space():
+    space = pymunk.Space()
+    space.gravity = 0, -900
+    space.damping = 0.9
+    space.iterations = 20
+
+    a = pymunk.Body(5, 50)
+    a.position = 10, 20
+    a.angle = 0.5
+    a.velocity = 3, -4
+    a.angular_velocity = 1.5
+    a.center_of_gravity = 1, 2
+    circle = pymunk.Circle(a, 7, (1, 1))
+    circle.friction = 0.3
+    circle.elasticity = 0.8
+    circle.collision_type = 3
+
+    b = pymunk.Body(2, 10)
+    b.position = -40, 60
+    poly = pymunk.Poly(b, [(0, 0), (10, 0), (5, 8)], radius=0.5)
+    poly.sensor = True
+
+    kinematic = pymunk.Body(body_type=pymunk.Body.KINEMATIC)
+    kinematic.position = 100, 0
+    kinematic.velocity = 5, 0
+    platform = pymunk.Poly.create_box(kinematic, (40, 5))
+
+    ground = pymunk.Segment(space.static_body, (-500, 0), (500, 0), 2)
+    ground.friction = 1.0
+
+    constraints = [
+        pymunk.PinJoint(a, b, (1, 0), (0, 1)),
+        pymunk.SlideJoint(a, b, (0, 0), (0, 0), 5, 15),
+        pymunk.PivotJoint(a, kinematic, (2, 2), (-3, 0)),
+        pymunk.DampedSpring(a, b, (0, 0), (1, 1), 30, 200, 5),
+        pymunk.SimpleMotor(a, b, 2.5),
+        pymunk.GearJoint(a, b, 0.25, 3),
+        pymunk.RotaryLimitJoint(a, b, -1, 1),
+        pymunk.PinJoint(b, space.static_body, (0, 0), (0, 100)),
+    ]
+    constraints[0].max_force = 1000
+    constraints[0].collide_bodies = False
+    constraints[1].error_bias = 0.5
+    constraints[2].max_bias = 40
+
+    space.add(a, circle, b, poly, kinematic, platform, ground, *constraints)
+    return space, {"a": a, "circle": circle, "motor": constraints[4]}
+
+
+def body_state(b):
+    return (b.body_type, b.mass if b.body_type == pymunk.Body.DYNAMIC else None,
+            b.moment if b.body_type == pymunk.Body.DYNAMIC else None,
+            tuple(b.position), b.angle, tuple(b.velocity), b.angular_velocity,
+            tuple(b.center_of_gravity))
+
+
+def shape_state(s):
+    if isinstance(s, pymunk.Circle):
+        geometry = (s.radius, tuple(s.offset))
+    elif isinstance(s, pymunk.Poly):
+        # chipmunk may start the hull at a different vertex
+        geometry = (s.radius, tuple(sorted(tuple(v) for v in s.get_vertices())))
+    else:
+        geometry = (s.radius, tuple(s.a), tuple(s.b))
+    return (type(s), geometry, s.friction, s.elasticity, s.collision_type, s.sensor)
+
+
+def constraint_state(c):
+    attributes = {}
+    for cls, names, _ in checkpoint.CONSTRAINTS:
+        if type(c) is cls:
+            for name in names:
+                value = getattr(c, name)
+                attributes[name] = tuple(value) if name.startswith("anchor") else value
+    return (type(c), attributes, c.collide_bodies, c.max_force, c.error_bias, c.max_bias)
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_round_trip(tmp_path, background):
+    space, named = build_space()
+    path = str(tmp_path / "scene.ckpt")
+    state = {"seed": 1234, "score": 7.5, "names": ["a", "b"]}
+    result = checkpoint.save(path, space, named=named, state=state, background=background)
+    if background:
+        result = result.result()
+    assert result == path
+
+    scene = checkpoint.load(path)
+    loaded = scene.space
+    assert tuple(loaded.gravity) == (0, -900)
+    assert loaded.damping == 0.9
+    assert loaded.iterations == 20
+    assert scene.state == state
+
+    assert [body_state(b) for b in scene.bodies] == [body_state(b) for b in space.bodies]
+    assert [shape_state(s) for s in scene.shapes] == [shape_state(s) for s in space.shapes]
+    assert ([constraint_state(c) for c in scene.constraints] ==
+            [constraint_state(c) for c in space.constraints])
+
+    # constraints are reattached to the matching bodies, static ones included
+    indices = {b: i for i, b in enumerate(space.bodies)}
+    indices[space.static_body] = "static"
+    loaded_indices = {b: i for i, b in enumerate(scene.bodies)}
+    loaded_indices[loaded.static_body] = "static"
+    assert ([(loaded_indices[c.a], loaded_indices[c.b]) for c in scene.constraints] ==
+            [(indices[c.a], indices[c.b]) for c in space.constraints])
+
+    assert body_state(scene.named["a"]) == body_state(named["a"])
+    assert shape_state(scene.named["circle"]) == shape_state(named["circle"])
+    assert scene.named["motor"].rate == 2.5
+
+
+def test_without_static(tmp_path):
+    space, _ = build_space()
+    path = str(tmp_path / "scene.ckpt")
+    checkpoint.save(path, space, include_static=False, background=False)
+    scene = checkpoint.load(path)
+    assert len(scene.bodies) == 3
+    assert not any(isinstance(s, pymunk.Segment) for s in scene.shapes)
+    # the pin to the static body goes with it
+    assert len(scene.constraints) == 7
+
+
+def test_groups(tmp_path):
+    space = pymunk.Space()
+    group = Group()
+    # the L-shaped polygon has a shape per convex piece
+    group.add_all([Circle(0, 0, 5), Rectangle(20, 0, 10, 10),
+                   Polygon(50, 0, [(0, 0), (20, 0), (20, 10), (10, 10), (10, 20), (0, 20)])])
+    group.set_attribute("friction", 0.25)
+    group.add_to_space(space)
+    path = str(tmp_path / "scene.ckpt")
+    checkpoint.save(path, space, groups={"things": group}, background=False)
+
+    loaded = checkpoint.load(path).groups["things"]
+    assert [type(child) for child in loaded] == [Circle, Rectangle, Polygon]
+    assert len(list(loaded)[2].shapes) == 2
+    for original, child in zip(group, loaded):
+        assert child.shape is child.shapes[0]
+        assert child.shape.body is child.body
+        assert body_state(child.body) == body_state(original.body)
+        assert [shape_state(s) for s in child.shapes] == [shape_state(s) for s in original.shapes]
+
+
+def test_groups_without_static(tmp_path):
+    space = pymunk.Space()
+    group = Group()
+    group.add_all([Circle(0, 0, 5), Segment(0, -10, (0, -10), (100, -10), body_type=Body.STATIC)])
+    group.add_to_space(space)
+    path = str(tmp_path / "scene.ckpt")
+    checkpoint.save(path, space, groups={"things": group}, include_static=False, background=False)
+
+    # static children are left out along with their bodies
+    loaded = checkpoint.load(path).groups["things"]
+    assert [type(child) for child in loaded] == [Circle]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "scene.ckpt"
+    path.write_bytes(b"NOPE" + bytes(60))
+    with pytest.raises(ValueError):
+        checkpoint.load(str(path))
+
+    space, _ = build_space()
+    checkpoint.save(str(path), space, background=False)
+    data = bytearray(path.read_bytes())
+    data[4:6] = (99).to_bytes(2, "little")
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        checkpoint.load(str(path))
+
+
+def test_failed_background_write_is_reported(tmp_path, capsys):
+    space, _ = build_space()
+    future = checkpoint.save(str(tmp_path / "missing" / "scene.ckpt"), space)
+    future.add_done_callback(checkpoint.report)
+    with pytest.raises(FileNotFoundError):
+        future.result()
+    assert "checkpoint not saved" in capsys.readouterr().err
+
+
+def test_copy_body_state_with_offset_center_of_gravity():
+    source = pymunk.Body(1, 1)
+    source.center_of_gravity = 15, 10
+    source.angle = 2.0
+    source.position = 300, 400
+    source.velocity = 1, 2
+    target = pymunk.Body(1, 1)
+    target.center_of_gravity = 15, 10
+    checkpoint.copy_body_state(source, target)
+    assert body_state(target) == body_state(source)
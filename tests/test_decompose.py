@@ -0,0 +1,116 @@
+import pytest
+
+from engine.decompose import cross, signed_area, is_convex, convex_decomposition, mass_properties
+
+
+def inside(point, piece):
+    """Strictly inside a counter-clockwise convex piece."""
+    return all(cross(piece[i - 1], p, point) > 1e-9 for i, p in enumerate(piece))
+
+
+def in_outline(point, outline):
+    """Even-odd test for a simple polygon."""
+    x, y = point
+    result = False
+    for i, (bx, by) in enumerate(outline):
+        ax, ay = outline[i - 1]
+        if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+            result = not result
+    return result
+
+
+POLYGONS = {
+    "triangle": [(0, 0), (10, 0), (0, 10)],
+    "square": [(0, 0), (10, 0), (10, 10), (0, 10)],
+    "clockwise square": [(0, 0), (0, 10), (10, 10), (10, 0)],
+    "collinear square": [(0, 0), (5, 0), (10, 0), (10, 5), (10, 10), (5, 10), (0, 10), (0, 5)],
+    "repeated vertex": [(0, 0), (10, 0), (10, 0), (10, 10), (0, 10)],
+    "L": [(0, 0), (20, 0), (20, 10), (10, 10), (10, 20), (0, 20)],
+    "clockwise L": [(0, 20), (10, 20), (10, 10), (20, 10), (20, 0), (0, 0)],
+    "U": [(0, 0), (30, 0), (30, 30), (20, 30), (20, 10), (10, 10), (10, 30), (0, 30)],
+    "collinear U": [(0, 0), (15, 0), (30, 0), (30, 30), (20, 30), (20, 20), (20, 10), (10, 10),
+                    (10, 30), (0, 30), (0, 15)],
+    "star": [(0, 10), (3, 3), (10, 0), (3, -3), (0, -10), (-3, -3), (-10, 0), (-3, 3)],
+    "comb": [(0, 0), (50, 0), (50, 20), (45, 20), (40, 5), (35, 20), (30, 20), (25, 5), (20, 20),
+             (15, 20), (10, 5), (5, 20), (0, 20)],
+    # a square with a square hole, joined to the outside by a thin slit, so the
+    # reflex corners of the hole sit in a chain right next to each other
+    "keyhole": [(0, 0), (30, 0), (30, 30), (16, 30), (16, 20), (20, 20), (20, 10), (10, 10),
+                (10, 20), (14, 20), (14, 30), (0, 30)],
+    "spiral": [(0, 0), (40, 0), (40, 40), (10, 40), (10, 20), (25, 20), (25, 25), (15, 25),
+               (15, 35), (35, 35), (35, 5), (5, 5), (5, 40), (0, 40)],
+}
+
+
+@pytest.mark.parametrize("name", POLYGONS)
+def test_pieces_are_convex_and_counter_clockwise(name):
+    for piece in convex_decomposition(POLYGONS[name]):
+        assert len(piece) >= 3
+        assert signed_area(piece) > 0
+        assert is_convex(piece)
+
+
+@pytest.mark.parametrize("name", POLYGONS)
+def test_area_is_preserved(name):
+    outline = POLYGONS[name]
+    pieces = convex_decomposition(outline)
+    assert sum(signed_area(piece) for piece in pieces) == pytest.approx(abs(signed_area(outline)))
+
+
+@pytest.mark.parametrize("name", POLYGONS)
+def test_pieces_tile_the_outline(name):
+    outline = POLYGONS[name]
+    pieces = convex_decomposition(outline)
+    xs = [p[0] for p in outline]
+    ys = [p[1] for p in outline]
+    # a grid offset so that no sample lands on an edge or diagonal
+    for i in range(41):
+        for j in range(41):
+            point = (min(xs) + (max(xs) - min(xs)) * (i + 0.137) / 41,
+                     min(ys) + (max(ys) - min(ys)) * (j + 0.291) / 41)
+            covering = sum(inside(point, piece) for piece in pieces)
+            assert covering == (1 if in_outline(point, outline) else 0), point
+
+
+@pytest.mark.parametrize("name", ["triangle", "square", "clockwise square", "collinear square",
+                                  "repeated vertex"])
+def test_convex_outline_is_one_piece(name):
+    assert len(convex_decomposition(POLYGONS[name])) == 1
+
+
+def test_piece_count():
+    # Hertel-Mehlhorn merges back to at most twice the reflex vertices plus one
+    assert len(convex_decomposition(POLYGONS["L"])) == 2
+    assert len(convex_decomposition(POLYGONS["U"])) == 3
+    assert len(convex_decomposition(POLYGONS["star"])) <= 2 * 4 + 1
+
+
+def test_translation_shares_the_decomposition():
+    moved = [(x + 100, y - 50) for x, y in POLYGONS["L"]]
+    pieces = convex_decomposition(moved)
+    expected = [[(x + 100, y - 50) for x, y in piece] for piece in convex_decomposition(POLYGONS["L"])]
+    assert pieces == expected
+
+
+@pytest.mark.parametrize("outline", [
+    [(0, 0), (5, 0), (10, 0)], # collinear
+    [(0, 0), (10, 10), (10, 0), (0, 10)], # bow tie
+    [(0, 0), (20, 10), (20, 0), (0, 4)], # lopsided bow tie
+    [(0, 10), (6, -8), (-10, 3), (10, 3), (-6, -8)], # pentagram, every turn to the left
+    [(0, 0), (20, 0), (20, 10), (10, 0), (0, 10)], # vertex touching an edge
+])
+def test_degenerate_outlines_are_rejected(outline):
+    with pytest.raises(ValueError):
+        convex_decomposition(outline)
+
+
+def test_mass_properties_match_a_single_poly():
+    import pymunk
+    square = POLYGONS["square"]
+    cog, moment, masses = mass_properties(convex_decomposition(POLYGONS["L"]), 30)
+    assert cog == pytest.approx((50 / 6, 50 / 6))
+    assert sum(masses) == pytest.approx(30)
+
+    cog, moment, masses = mass_properties([square], 10)
+    assert cog == pytest.approx((5, 5))
+    assert moment == pytest.approx(pymunk.moment_for_box(10, (10, 10)))
@@ -0,0 +1,110 @@
+import random
+
+import numpy as np
+
+import pymunk
+
+from engine.history import RewindBuffer, capture_bodies
+
+
+def make_bodies(count, seed=0, offset_center=False):
+    rng = random.Random(seed)
+    bodies = []
+    for _ in range(count):
+        b = pymunk.Body(1, 1)
+        if offset_center:
+            b.center_of_gravity = rng.uniform(-20, 20), rng.uniform(-20, 20)
+        b.position = rng.uniform(-1000, 1000), rng.uniform(-1000, 1000)
+        bodies.append(b)
+    return bodies
+
+
+def move(bodies, rng):
+    for b in bodies:
+        b.position = b.position[0] + rng.uniform(-5, 5), b.position[1] + rng.uniform(-5, 5)
+        b.angle += rng.uniform(-0.1, 0.1)
+        b.velocity = rng.uniform(-100, 100), rng.uniform(-100, 100)
+        b.angular_velocity = rng.choice([0.0, -0.0, rng.uniform(-3, 3)])
+
+
+def record_run(bodies, history, ticks, start=0, seed=1):
+    rng = random.Random(seed)
+    expected = {}
+    for tick in range(start, start + ticks):
+        move(bodies, rng)
+        history.record(tick)
+        expected[tick] = capture_bodies(bodies)
+    return expected
+
+
+def test_rewind_restores_bit_for_bit():
+    bodies = make_bodies(8)
+    tick_box = []
+    history = RewindBuffer(bodies, every=1, keyframe_every=16, max_bytes=10 ** 8,
+                           capture_extra=lambda: tick_box[-1] * 10 if tick_box else None,
+                           restore_extra=tick_box.append)
+    rng = random.Random(1)
+    expected = {}
+    for tick in range(100):
+        move(bodies, rng)
+        tick_box.append(tick)
+        history.record(tick)
+        expected[tick] = capture_bodies(bodies)
+
+    # rewinding discards the future, so walk backwards through every tick
+    for tick in range(99, -1, -1):
+        assert history.rewind(tick) == tick
+        restored = capture_bodies(bodies)
+        # compare bit patterns, so -0.0 and 0.0 are told apart
+        assert np.array_equal(restored.view(np.uint64), expected[tick].view(np.uint64))
+        assert tick_box[-1] == tick * 10
+        assert history.newest_tick == tick
+
+
+def test_rewind_with_offset_center_of_gravity():
+    # like the lander's; restoring must not turn bodies about it. Positions
+    # are stored relative to the center of gravity, so they round slightly.
+    bodies = make_bodies(6, offset_center=True)
+    history = RewindBuffer(bodies, every=1, keyframe_every=16)
+    expected = record_run(bodies, history, 50)
+    for tick in range(49, -1, -7):
+        assert history.rewind(tick) == tick
+        assert np.allclose(capture_bodies(bodies), expected[tick], rtol=0, atol=1e-9)
+
+
+def test_rewind_between_captures_restores_the_one_before():
+    bodies = make_bodies(3)
+    history = RewindBuffer(bodies, every=4, keyframe_every=5)
+    expected = record_run(bodies, history, 60)
+    assert history.rewind(42) == 40
+    assert np.array_equal(capture_bodies(bodies), expected[40])
+
+
+def test_recording_after_a_rewind_continues_the_delta_chain():
+    bodies = make_bodies(5)
+    history = RewindBuffer(bodies, every=1, keyframe_every=8)
+    record_run(bodies, history, 30)
+    assert history.rewind(13) == 13
+    # the rewound tick is held already, so recording it again is a no-op
+    held = len(history)
+    history.record(13)
+    assert len(history) == held
+
+    expected = record_run(bodies, history, 26, start=14, seed=7)
+    for tick in range(39, 13, -1):
+        assert history.rewind(tick) == tick
+        assert np.array_equal(capture_bodies(bodies), expected[tick])
+
+
+def test_memory_bound_drops_oldest_groups():
+    bodies = make_bodies(20)
+    history = RewindBuffer(bodies, every=1, keyframe_every=10, max_bytes=8 * 1024)
+    expected = record_run(bodies, history, 500)
+    assert history.nbytes <= 8 * 1024 or len(history.groups) == 1
+    assert history.nbytes == sum(group.nbytes for group in history.groups)
+    oldest = history.oldest_tick
+    assert oldest > 0 and oldest % 10 == 0
+
+    assert history.rewind(oldest) == oldest
+    assert np.array_equal(capture_bodies(bodies), expected[oldest])
+    assert history.rewind(oldest - 1) is None
@@ -0,0 +1,36 @@
+import pymunk
+
+from engine import landers
+
+
+def drop(speed, steps=120):
+    """Drop a lander onto flat ground at speed and return the damage it takes."""
+    space = pymunk.Space()
+    space.gravity = 0, -20
+    ground = pymunk.Segment(space.static_body, (-500, 0), (500, 0), 1)
+    ground.collision_type = landers.TERRAIN
+    ground.friction = 1.0
+    space.add(ground)
+
+    # just clear of the ground, so it hits at close to speed
+    body, _ = landers.create_lander(space, 0, 1.05)
+    body.velocity = 0, -speed
+
+    damage = []
+    handler = space.add_collision_handler(landers.LANDER, landers.TERRAIN)
+    handler.post_solve = lambda arbiter, space, data: damage.append(landers.impact_damage(arbiter))
+    for _ in range(steps):
+        space.step(1 / 60)
+    assert damage, "the lander never touched the ground"
+    return sum(damage)
+
+
+def test_soft_landing_is_free():
+    assert drop(2) == 0
+
+
+def test_crash_onto_flat_ground_does_damage():
+    slow = drop(10)
+    fast = drop(60)
+    assert slow > 0
+    assert fast > 5 * slow
@@ -0,0 +1,33 @@
+import json
+
+from engine.rocketry import Part, Engine, Rocket, load_part, part_state
+
+
+def test_part_state_round_trip():
+    pod = Part()
+    pod.vertices = [(0, 0), (45, 90), (90, 0)]
+    pod.mass = 10
+    engine = Engine()
+    engine.vertices = [(0, 0), (0, -engine.height), (engine.radial_size, -engine.height), (engine.radial_size, 0)]
+    engine.engage()
+    rocket = Rocket()
+    rocket.add_part(pod)
+    rocket.add_part(engine)
+    body, _, _ = rocket.get_body_and_shapes()
+    for _ in range(30):
+        rocket.fire(1 / 60)
+
+    # remaining burn is read back from the cluster, and the state survives JSON
+    states = json.loads(json.dumps([part_state(part) for part in rocket.parts]))
+    assert abs(states[1]["burn"] - (8.8 - 0.5)) < 1e-9
+
+    loaded = Rocket()
+    for state in states:
+        loaded.add_part(load_part(state))
+    loaded_body, _, _ = loaded.get_body_and_shapes()
+    assert [type(part) for part in loaded.parts] == [Part, Engine]
+    assert [part.vertices for part in loaded.parts] == [pod.vertices, engine.vertices]
+    assert loaded_body.mass == body.mass
+    assert loaded_body.moment == body.moment
+    assert loaded_body.center_of_gravity == body.center_of_gravity
+    assert loaded.engines.thrust().tolist() == rocket.engines.thrust().tolist()